@@ -37,6 +37,7 @@ EXTRAS_REQUIRE = {
         # "myst-parser"
     ],
     "tests": ["coverage[toml]>=5.5", "pytest"],
+    "fast": ["isal", "numpy", "pyahocorasick", "pyarrow", "rapidgzip"],
 }
 EXTRAS_REQUIRE["dev"] = (
     EXTRAS_REQUIRE["tests"] + EXTRAS_REQUIRE["docs"] + ["pre-commit"]
@@ -1,9 +1,16 @@
 from pathlib import Path as _Path
 
-from . import __path__ as _dir_nspath  # type: ignore
 from . import store
+from .shards import open_wit_shard, open_wit_tsv
 from .urls import DATA_DIR_URL, FULL_DATA_URLS, SAMPLE_DATA_URL
 
-__all__ = ["DATA_DIR_URL", "SAMPLE_DATA_URL", "FULL_DATA_URLS", "_dir_path"]
+__all__ = [
+    "DATA_DIR_URL",
+    "SAMPLE_DATA_URL",
+    "FULL_DATA_URLS",
+    "open_wit_shard",
+    "open_wit_tsv",
+    "_dir_path",
+]
 
-_dir_path = _Path(list(_dir_nspath)[0])
+_dir_path = _Path(__file__).parent
@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+import gzip
+import io
+import mmap
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import IO, BinaryIO, TextIO
+
+try:
+    import rapidgzip
+except ImportError:  # pragma: no cover
+    rapidgzip = None  # Fall back to (single-threaded) ISA-L, else stdlib gzip
+
+try:
+    from isal import igzip
+except ImportError:  # pragma: no cover
+    igzip = None  # Fall back to stdlib gzip
+
+__all__ = ["open_wit_shard", "open_wit_tsv"]
+
+_READ_BUFFER_SIZE = 1 << 20  # 1 MiB
+
+# Decompressed shards: {shard path: ((size, mtime), temporary file)}
+_decompressed: dict[Path, tuple[tuple[int, int], IO[bytes]]] = {}
+
+
+def open_wit_shard(path_or_url: Path | str) -> TextIO:
+    """
+    Open a TSV shard of the WIT dataset for reading as text. Gzip-compressed shards
+    are decompressed in parallel across all CPU cores with :mod:`rapidgzip` if it is
+    installed (the ``fast`` extra), else on a single core with the SIMD-accelerated
+    :mod:`isal.igzip` if that is installed, else with :mod:`gzip`.
+
+    If given a URL (one of :data:`~wikitransp.data.SAMPLE_DATA_URL` or
+    :data:`~wikitransp.data.FULL_DATA_URLS`), the shard is first downloaded to the
+    package data store (or the download is resumed, if incomplete) using
+    :func:`~wikitransp.scraper.download_utils.download_data_url`.
+
+    The returned file handle should be closed after use (e.g. with a ``with`` block).
+
+    Args:
+      path_or_url : The path to the shard on disk, or its URL.
+    """
+    path = _resolve_shard(path_or_url)
+    return io.TextIOWrapper(_open_binary(path), encoding="utf-8", newline="")
+
+
+def open_wit_tsv(path_or_url: Path | str, tmp_dir: Path | None = None) -> mmap.mmap:
+    """
+    Memory-map the (decompressed) TSV of a shard of the WIT dataset, for repeated
+    passes or random access. A gzip-compressed shard is decompressed to a temporary
+    file only on the first call for it in this process; subsequent calls map the same
+    file (unless the shard has changed since), so all readers are served from the OS
+    page cache rather than each repeating the decompression. The temporary files are
+    deleted when the process exits.
+
+    The returned map should be closed after use (e.g. with a ``with`` block).
+
+    Raises:
+      ValueError if the TSV is empty (or the shard decompresses to nothing), as an
+      empty file can't be memory-mapped.
+
+    Args:
+      path_or_url : The path to the shard on disk, or its URL (as for
+                    :func:`~wikitransp.data.open_wit_shard`).
+      tmp_dir     : The directory to decompress into (default: the system temporary
+                    directory, which may be in memory: the shards decompress to
+                    several GB).
+    """
+    path = _resolve_shard(path_or_url)
+    if path.suffix != ".gz":
+        with open(path, "rb") as f:
+            return _map_read_only(f, path)
+    path = path.resolve()
+    stat = path.stat()
+    signature = (stat.st_size, stat.st_mtime_ns)
+    cached_signature, tmp = _decompressed.get(path, (None, None))
+    if tmp is None or cached_signature != signature:
+        if tmp is not None:
+            tmp.close()  # The shard changed so the decompressed file is stale
+        tmp = tempfile.NamedTemporaryFile(suffix=".tsv", dir=tmp_dir)
+        with _open_binary(path) as f:
+            shutil.copyfileobj(f, tmp, _READ_BUFFER_SIZE)
+        tmp.flush()
+        _decompressed[path] = (signature, tmp)
+    return _map_read_only(tmp, path)
+
+
+def _map_read_only(f: IO[bytes], path: Path) -> mmap.mmap:
+    """
+    Memory-map an open file for reading, raising a clear error if it is empty (rather
+    than the :class:`ValueError` "cannot mmap an empty file").
+
+    Args:
+      f    : The open file to map
+      path : The path of the shard it holds the TSV of (for the error message)
+    """
+    if os.fstat(f.fileno()).st_size == 0:
+        raise ValueError(f"The TSV of {path} is empty, so can't be memory-mapped")
+    return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _resolve_shard(path_or_url: Path | str) -> Path:
+    """
+    Get the path on disk to a shard, downloading it first if given a URL.
+
+    Args:
+      path_or_url : The path to the shard on disk, or its URL.
+    """
+    if isinstance(path_or_url, str) and path_or_url.startswith(("http:", "https:")):
+        # Import here as the scraper package imports from this one
+        from ..scraper.download_utils import download_data_url
+
+        return download_data_url(path_or_url)
+    return Path(path_or_url)
+
+
+def _open_binary(path: Path) -> BinaryIO:
+    """
+    Open a shard for reading as bytes, decompressing it if gzip-compressed (using all
+    CPU cores if :mod:`rapidgzip` is installed, else ISA-L if :mod:`isal` is).
+
+    Args:
+      path : The path to the shard on disk.
+    """
+    if path.suffix != ".gz":
+        return open(path, "rb")
+    if rapidgzip is not None:
+        raw = rapidgzip.open(str(path), parallelization=os.cpu_count())
+    elif igzip is not None:
+        raw = igzip.IGzipFile(path)
+    else:
+        raw = gzip.GzipFile(path)
+    return io.BufferedReader(raw, buffer_size=_READ_BUFFER_SIZE)
@@ -1,69 +1,577 @@
 from __future__ import annotations
 
 import asyncio
+import atexit
+import hashlib
+import shutil
+import sys
+import threading
+from collections import defaultdict
 from functools import partial
-from typing import TYPE_CHECKING, Iterator
+from pathlib import Path
+from typing import TYPE_CHECKING, Coroutine, Iterable, Iterator
 
 import httpx
-from aiostream import stream
+from more_itertools import chunked
+
+from ..data.store import _dir_path as store_path
+from .clients import _MAX_CONNECTIONS, make_client
 
 if TYPE_CHECKING:
     import tqdm
     from range_streams.codecs.png import PngStream
 
-__all__ = ["fetch", "process", "async_fetch_urlset", "fetch_images"]
+__all__ = [
+    "fetch",
+    "fetch_image",
+    "image_filename",
+    "async_fetch_urlset",
+    "fetch_images",
+    "async_fetch_shards",
+    "get_shared_client",
+    "close_shared_client",
+]
+
+_TASK_LIMIT = 20
+_HOST_LIMIT = 8  # Concurrent requests per host, to stay under its rate limits
+_TIMEOUT_S = 10.0
+_CHUNK_SIZE = 64 * 1024
+_BATCH_FACTOR = 4  # Tasks scheduled at once per unit of task_limit (backpressure)
+_IMAGE_DIR = store_path / "images"
+_URL_HASH_LENGTH = 12  # Hex digits of the URL hash that image filenames start with
+_RETRY_STATUS_CODES = (429, 503)
+_RETRIES = 3
+_BACKOFF_S = 1.0  # Doubled upon each retry, unless the server gives a Retry-After
+_MAX_BACKOFF_S = 30.0
+_PARTS_PER_FILE = 8  # Concurrent range requests per (large) file
+
+_shared_client: httpx.AsyncClient | None = None
+_shared_client_loop: asyncio.AbstractEventLoop | None = None
+_sync_loop: asyncio.AbstractEventLoop | None = None  # Kept for `fetch_images` calls
+
+
+def get_shared_client(
+    timeout_s: float = _TIMEOUT_S, max_connections: int = _MAX_CONNECTIONS
+) -> httpx.AsyncClient:
+    """
+    Lazily construct the module-level :class:`httpx.AsyncClient`, so that repeated
+    batches of fetches share a connection pool (and so skip repeating the DNS
+    lookup and TCP/TLS handshakes for hosts already connected to).
+
+    The client is made by :func:`~wikitransp.scraper.clients.make_client`, so it
+    sends the package's User-Agent and uses HTTP/2: concurrent requests to the same
+    host are multiplexed as streams over one connection, so the ``max_connections``
+    limit is a cap on sockets, not on request concurrency (which is set by the caller).
+
+    Pooled connections are bound to the event loop they were opened on, so the
+    client is only shared between calls within a single running event loop. The
+    synchronous :func:`~wikitransp.scraper.async_utils.fetch_images` always runs on
+    the same (module-level) loop, so its calls share the client. If the client is
+    requested from a different running loop than the one it was first used on, it is
+    closed and rebuilt (but if that loop was already closed, its connections can't be
+    closed cleanly: await :func:`close_shared_client` before closing a loop of your
+    own). The ``timeout_s`` and ``max_connections`` arguments only take effect when
+    the client is (re)built.
+
+    Args:
+      timeout_s       : The timeout (in seconds) for each request
+      max_connections : The number of connections to keep in the pool
+    """
+    global _shared_client, _shared_client_loop
+    try:
+        loop: asyncio.AbstractEventLoop | None = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = None  # Called outside of a coroutine: bind on first use in a loop
+    stale_loop = loop is not None and _shared_client_loop not in (None, loop)
+    if stale_loop:
+        # A loop is only recorded along with the client it was used with
+        assert _shared_client is not None and _shared_client_loop is not None
+        if not _shared_client.is_closed:
+            _close_on_loop(_shared_client, _shared_client_loop)
+    if _shared_client is None or _shared_client.is_closed or stale_loop:
+        _shared_client = make_client(
+            fetch_async=True, timeout_s=timeout_s, max_connections=max_connections
+        )
+        _shared_client_loop = None
+    if _shared_client_loop is None:
+        _shared_client_loop = loop
+    return _shared_client
+
+
+def _close_on_loop(client: httpx.AsyncClient, loop: asyncio.AbstractEventLoop) -> None:
+    """
+    Close a client on the event loop its connections were opened on, from outside
+    that loop (as it is being replaced by a client for the loop now running).
+
+    Args:
+      client : The client to close
+      loop   : The event loop the client was used on
+    """
+    if loop.is_closed():
+        return  # Its connections are only released when the client is freed
+    if loop.is_running():
+        # In another thread: hand it the closing, as it can't be run from here
+        asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+        return
+    # This thread is running another loop, so run the idle one in a new thread
+    closer = threading.Thread(target=loop.run_until_complete, args=(client.aclose(),))
+    closer.start()
+    closer.join()
+
+
+async def close_shared_client() -> None:
+    """
+    Close the module-level client (if any), releasing its pooled connections.
+    """
+    global _shared_client, _shared_client_loop
+    if _shared_client is not None:
+        await _shared_client.aclose()
+    _shared_client = _shared_client_loop = None
 
 
 async def fetch(
-    session: httpx.AsyncClient, url: str | httpx.URL, raise_for_status: bool = False
-):
-    response: httpx.Response = await session.get(str(url))  # type: ignore
-    if raise_for_status:
-        response.raise_for_status()
-    return response
+    session: httpx.AsyncClient,
+    url: str | httpx.URL,
+    dest: Path,
+    raise_for_status: bool = False,
+    chunk_size: int = _CHUNK_SIZE,
+    verbose: bool = False,
+    retries: int = _RETRIES,
+    headers: dict[str, str] | None = None,
+    content_range: tuple[int, int] | None = None,
+) -> Path:
+    """
+    Stream the response body for ``url`` to the file at ``dest`` one chunk at a time,
+    so that only ``chunk_size`` bytes per request are held in memory (rather than the
+    entire body). A partially written file is removed if the download fails.
+
+    If the server responds that it is rate limiting (429) or unavailable (503), the
+    request is retried up to ``retries`` times after an exponential backoff (or after
+    the delay in the response's ``Retry-After`` header, if given in seconds).
+
+    Args:
+      session          : The client to send the request with
+      url              : The URL to fetch
+      dest             : The file path to write the response body to
+      raise_for_status : Whether to raise an error for non-2xx status codes
+      chunk_size       : The number of bytes to read from the response at a time
+      verbose          : Whether to print the URL and HTTP version once fetched
+      retries          : How many times to retry a rate limited request
+      headers          : (Optional) Headers to send with the request
+      content_range    : (Optional) The first and last byte positions of the range
+                         requested: if the response is not a 206 Partial Content of
+                         exactly this range, :class:`ValueError` is raised before any
+                         of it is read (e.g. if the server ignored the range)
+    """
+    attempt = 0
+    while True:
+        try:
+            async with session.stream("GET", str(url), headers=headers) as response:
+                rate_limited = response.status_code in _RETRY_STATUS_CODES
+                if rate_limited and attempt < retries:
+                    delay = retry_delay(response, attempt=attempt)
+                else:
+                    if raise_for_status:
+                        response.raise_for_status()
+                    if content_range is not None:
+                        _check_content_range(response, content_range)
+                    with open(dest, "wb") as f:
+                        async for chunk in response.aiter_bytes(chunk_size):
+                            f.write(chunk)
+                    if verbose:
+                        print(f"Fetched {url} ({response.http_version}) --> {dest}")
+                    return dest
+        except BaseException:
+            dest.unlink(missing_ok=True)
+            raise
+        await asyncio.sleep(delay)  # Sleep after the connection has been released
+        attempt += 1
+
+
+def _check_content_range(response: httpx.Response, byte_range: tuple[int, int]) -> None:
+    """
+    Check that a response is a 206 Partial Content of exactly the (inclusive) range
+    ``byte_range``, from its status and ``Content-Range`` header.
+
+    Raises:
+      ValueError if the response is of anything other than that range.
+
+    Args:
+      response   : The response to the range request (before its body is read)
+      byte_range : The first and last byte positions requested
+    """
+    first, last = byte_range
+    got_range = response.headers.get("Content-Range", "").partition("/")[0]
+    is_partial = response.status_code == httpx.codes.PARTIAL_CONTENT
+    if not is_partial or got_range != f"bytes {first}-{last}":
+        raise ValueError(
+            f"Requested bytes {first}-{last} of {response.url} but got "
+            f"{response.status_code} response ({got_range or 'no Content-Range'})"
+        )
 
 
-async def process_image(
-    data: httpx.Response,
-    images: list[str],
+def retry_delay(response: httpx.Response, attempt: int) -> float:
+    """
+    How long to wait before retrying a rate limited request: the ``Retry-After``
+    header if the server gave one (in seconds), else an exponential backoff.
+
+    Args:
+      response : The rate limited (429) or unavailable (503) response
+      attempt  : The number of retries already made for this request
+    """
+    retry_after = response.headers.get("Retry-After", "")
+    delay = float(retry_after) if retry_after.isdigit() else _BACKOFF_S * 2**attempt
+    return min(delay, _MAX_BACKOFF_S)
+
+
+async def fetch_image(
+    session: httpx.AsyncClient,
+    url: str | httpx.URL,
+    images_by_url: dict[str, dict],
+    save_dir: Path,
+    host_sems: dict[str, asyncio.Semaphore],
     pbar: tqdm.std.tqdm | None = None,
     verbose: bool = False,
-):
-    # Map the response back to the image it came from in the images list
-    source_url = data.history[0].url if data.history else data.url
-    image = next(im for im in images if source_url == im.get("url"))
-    # breakpoint()
-    downloaded_image = data.content
-    if verbose:
-        print({source_url: "foo"})
-    image.update({"stream": downloaded_image})
-    if pbar:
-        pbar.update()
+) -> None:
+    """
+    Download the image at ``url`` into ``save_dir`` (see :func:`image_filename`), and
+    record the file path on its image dict under the ``"path"`` key. The number of
+    concurrent requests to each host is limited by its semaphore in ``host_sems``. If
+    the response is an error (e.g. a 404, or a 429 once the retries run out), nothing
+    is saved and no path is recorded, as for a URL with no filename (which is not
+    requested).
+    """
+    try:
+        url = httpx.URL(url)
+        image = images_by_url[str(url)]
+        try:
+            dest = save_dir / image_filename(url)
+        except ValueError:
+            return  # Skip it rather than raise, as for an error response
+        async with host_sems[url.host]:
+            try:
+                path = await fetch(
+                    session, url, dest=dest, raise_for_status=True, verbose=verbose
+                )
+            except httpx.HTTPStatusError:
+                # Skip it rather than raise, which would cancel the other fetches
+                return
+        image.update({"path": path})
+    finally:
+        if pbar:
+            pbar.update()
+
+
+def image_filename(url: httpx.URL) -> str:
+    """
+    The name to save the image at ``url`` under: the final part of its URL path,
+    prefixed with a hash of the entire URL, as images at different paths (e.g. of
+    different wikis, or thumbnails of different sizes) often share the final part.
+
+    Raises:
+      ValueError if the URL path has no final part (i.e. it ends in ``/``).
+
+    Args:
+      url : The URL of the image
+    """
+    basename = url.path.rsplit("/", 1)[-1]
+    if not basename:
+        raise ValueError(f"No filename at the end of the path of {url}")
+    url_hash = hashlib.sha1(str(url).encode()).hexdigest()[:_URL_HASH_LENGTH]
+    return f"{url_hash}-{basename}"
+
+
+async def _bounded(sem: asyncio.Semaphore, fetcher, *args) -> None:
+    """
+    Await ``fetcher(*args)`` once the semaphore ``sem`` has a free slot.
+    """
+    async with sem:
+        await fetcher(*args)
 
 
 async def async_fetch_urlset(
     urls: list[str] | Iterator[str],
-    images: list[str],
+    images: list[dict],
     pbar: tqdm.std.tqdm | None = None,
     verbose: bool = False,
-    timeout_s: float = 10.0,
+    timeout_s: float = _TIMEOUT_S,
+    task_limit: int = _TASK_LIMIT,
+    session: httpx.AsyncClient | None = None,
+    save_dir: Path = _IMAGE_DIR,
+    host_limit: int = _HOST_LIMIT,
 ):
-    timeout = httpx.Timeout(timeout=timeout_s)
-    async with httpx.AsyncClient(timeout=timeout_cfg) as session:
-        ws = stream.repeat(session)
-        xs = stream.zip(ws, stream.iterate(urls))
-        ys = stream.starmap(
-            xs, fetch, ordered=False, task_limit=20
-        )  # 30 is similar IDK
-        process = partial(process_image, images=images, pbar=pbar, verbose=verbose)
-        zs = stream.map(ys, process)
-        return await zs
+    """
+    Fetch the ``urls`` concurrently (up to ``task_limit`` requests in flight, and up
+    to ``host_limit`` to any one host), streaming each response to a file in
+    ``save_dir`` and storing its path on the matching entry in ``images``.
+
+    Unless a ``session`` is passed, the shared client from
+    :func:`~wikitransp.scraper.async_utils.get_shared_client` is used. It keeps its
+    connections alive rather than repeating the TCP/TLS handshake for each image, and
+    uses HTTP/2 so the ``task_limit`` concurrent requests to the same host are
+    multiplexed over a few connections rather than each needing its own.
+
+    Args:
+      urls       : The URLs to fetch
+      images     : The image dicts (with a ``"url"`` key) to store file paths on
+      pbar       : (Optional) A progress bar to update upon each completed fetch
+      verbose    : Whether to print each fetched URL (and its HTTP version)
+      timeout_s  : The timeout (in seconds) for each request
+      task_limit : The maximum number of concurrent requests (default: 20)
+      session    : (Optional) An externally managed client to fetch with (it will
+                   not be closed after use)
+      save_dir   : The directory to save the images in (default: ``images``
+                   subdirectory of the package data store)
+      host_limit : The maximum number of concurrent requests to a single host
+                   (default: 8), as a URL list dominated by one host would otherwise
+                   trigger its rate limiting
+    """
+    if session is None:
+        session = get_shared_client(timeout_s=timeout_s)
+    save_dir.mkdir(parents=True, exist_ok=True)
+    # Index the images by (normalised) URL so each URL is matched in O(1)
+    images_by_url = {str(httpx.URL(im["url"])): im for im in images}
+    host_sems: defaultdict[str, asyncio.Semaphore] = defaultdict(
+        lambda: asyncio.Semaphore(host_limit)
+    )
+    fetch_to_dir = partial(
+        fetch_image,
+        images_by_url=images_by_url,
+        save_dir=save_dir,
+        host_sems=host_sems,
+        pbar=pbar,
+        verbose=verbose,
+    )
+    sem = asyncio.Semaphore(task_limit)
+    # Only create a bounded number of tasks at a time so a huge iterable of URLs
+    # isn't turned into a huge number of pending tasks up front
+    for url_batch in chunked(urls, task_limit * _BATCH_FACTOR):
+        await _run_tasks(
+            [_bounded(sem, fetch_to_dir, session, url) for url in url_batch]
+        )
+
+
+async def _run_tasks(coros: list[Coroutine]) -> None:
+    """
+    Run the coroutines ``coros`` concurrently as tasks, cancelling those still pending
+    if any of them raises an error. On Python 3.11+ this is done with a task group, so
+    errors are raised together as an ``ExceptionGroup``.
+    """
+    if sys.version_info >= (3, 11):
+        async with asyncio.TaskGroup() as tg:
+            for coro in coros:
+                tg.create_task(coro)
+        return
+    tasks = [asyncio.create_task(coro) for coro in coros]
+    try:
+        for fut in asyncio.as_completed(tasks):
+            await fut
+    finally:
+        for task in tasks:
+            task.cancel()  # Only affects tasks left pending by an error
 
 
 def fetch_images(
     urls: list[str] | Iterator[str],
-    images: list[str],
+    images: list[dict],
     pbar: tqdm.std.tqdm | None = None,
     verbose: bool = False,
-):
-    return asyncio.run(async_fetch_urlset(urls, images, pbar, verbose))
+    task_limit: int = _TASK_LIMIT,
+    session: httpx.AsyncClient | None = None,
+    save_dir: Path = _IMAGE_DIR,
+) -> asyncio.Task | None:
+    """
+    Fetch the ``urls`` with :func:`~wikitransp.scraper.async_utils.async_fetch_urlset`
+    (see there for the arguments), on an event loop kept for these calls (rather than
+    a new loop each time, as with :func:`asyncio.run`) so that they share the pooled
+    connections of the shared client. If called from within a running event loop
+    (e.g. in a Jupyter notebook), where another can't be run, the fetching is
+    scheduled on that loop instead and the task is returned for the caller to await.
+    """
+    coro = async_fetch_urlset(
+        urls,
+        images,
+        pbar,
+        verbose,
+        task_limit=task_limit,
+        session=session,
+        save_dir=save_dir,
+    )
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        # No event loop is running in this thread
+        return _get_sync_loop().run_until_complete(coro)
+    return loop.create_task(coro)
+
+
+def _get_sync_loop() -> asyncio.AbstractEventLoop:
+    """
+    Get the event loop which :func:`fetch_images` runs on when called synchronously,
+    creating it on first use. It is closed (along with the shared client, if used on
+    it) when the interpreter exits.
+    """
+    global _sync_loop
+    if _sync_loop is None or _sync_loop.is_closed():
+        _sync_loop = asyncio.new_event_loop()
+    return _sync_loop
+
+
+def _close_sync_loop() -> None:
+    """
+    Close the shared client (if it was used on the synchronous loop), then the loop.
+    """
+    if _sync_loop is None or _sync_loop.is_closed():
+        return
+    if _shared_client_loop is _sync_loop:
+        _sync_loop.run_until_complete(close_shared_client())
+    _sync_loop.close()
+
+
+atexit.register(_close_sync_loop)
+
+
+async def async_fetch_shards(
+    urls: Iterable[str],
+    out_dir: Path = store_path,
+    parts_per_file: int = _PARTS_PER_FILE,
+    task_limit: int = _TASK_LIMIT,
+    session: httpx.AsyncClient | None = None,
+    verbose: bool = False,
+) -> list[Path]:
+    """
+    Download the (large) files at ``urls`` into ``out_dir``, each as ``parts_per_file``
+    concurrent HTTP range requests which are then joined, and return their paths.
+    A single download is limited by the throughput of one TCP stream, whereas the
+    parts are multiplexed over the shared HTTP/2 connection (or spread across the
+    pool, if the server only speaks HTTP/1.1).
+
+    Files already in ``out_dir`` at their full size are not downloaded again, nor are
+    any parts completed by a previous (interrupted) call.
+
+    Args:
+      urls           : The URLs of the files to download (e.g.
+                       :data:`~wikitransp.data.FULL_DATA_URLS`)
+      out_dir        : The directory to save the files in (default: the package data
+                       store)
+      parts_per_file : The number of range requests to split each file into
+      task_limit     : The maximum number of concurrent requests (across all files)
+      session        : (Optional) An externally managed client to fetch with (it will
+                       not be closed after use)
+      verbose        : Whether to print each fetched part
+    """
+    if session is None:
+        session = get_shared_client()
+    out_dir.mkdir(parents=True, exist_ok=True)
+    sem = asyncio.Semaphore(task_limit)
+    fetch_to_dir = partial(
+        _fetch_shard,
+        session=session,
+        out_dir=out_dir,
+        parts_per_file=parts_per_file,
+        sem=sem,
+        verbose=verbose,
+    )
+    return list(await asyncio.gather(*map(fetch_to_dir, urls)))
+
+
+async def _fetch_shard(
+    url: str,
+    session: httpx.AsyncClient,
+    out_dir: Path,
+    parts_per_file: int,
+    sem: asyncio.Semaphore,
+    verbose: bool,
+) -> Path:
+    """
+    Download the file at ``url`` into ``out_dir`` as ``parts_per_file`` concurrent
+    range requests (each taking a slot in ``sem``), then join the parts. If the server
+    doesn't give the file's size, it can't be split into ranges so is downloaded whole.
+    """
+    dest = out_dir / httpx.URL(url).path.rsplit("/", 1)[-1]
+    async with sem:
+        response = await session.head(url)
+    response.raise_for_status()
+    content_length = response.headers.get("Content-Length")
+    if content_length is None:
+        async with sem:
+            return await fetch(
+                session, url, dest, raise_for_status=True, verbose=verbose
+            )
+    total_bytes = int(content_length)
+    if dest.exists() and dest.stat().st_size == total_bytes:
+        return dest
+    if total_bytes == 0:
+        dest.write_bytes(b"")  # There's no range of an empty file to request
+        return dest
+    part_size = -(-total_bytes // parts_per_file)  # Round up so parts cover the file
+    part_fetches = [
+        asyncio.ensure_future(
+            _fetch_part(
+                session,
+                url,
+                dest=dest.with_name(f"{dest.name}.part{k}"),
+                byte_range=(start, min(start + part_size, total_bytes)),
+                sem=sem,
+                verbose=verbose,
+            )
+        )
+        for k, start in enumerate(range(0, total_bytes, part_size))
+    ]
+    try:
+        parts = await asyncio.gather(*part_fetches)
+    finally:
+        for part_fetch in part_fetches:
+            part_fetch.cancel()  # Only affects parts left pending by an error
+    # Join the parts off the event loop, as the shards are several GB
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, _join_parts, parts, dest)
+    return dest
+
+
+async def _fetch_part(
+    session: httpx.AsyncClient,
+    url: str,
+    dest: Path,
+    byte_range: tuple[int, int],
+    sem: asyncio.Semaphore,
+    verbose: bool,
+) -> Path:
+    """
+    Download the half-open ``byte_range`` of the file at ``url`` to ``dest``, unless
+    already downloaded there (partial downloads are removed by
+    :func:`~wikitransp.scraper.async_utils.fetch`). If the server doesn't respond with
+    exactly that range (e.g. ignoring it and sending the entire file), an error is
+    raised before anything is downloaded.
+    """
+    start, stop = byte_range
+    if dest.exists() and dest.stat().st_size == stop - start:
+        return dest
+    range_header = {"Range": f"bytes={start}-{stop - 1}"}
+    async with sem:
+        await fetch(
+            session,
+            url,
+            dest,
+            raise_for_status=True,
+            verbose=verbose,
+            headers=range_header,
+            content_range=(start, stop - 1),
+        )
+    if dest.stat().st_size != stop - start:
+        # The response was cut off
+        dest.unlink()
+        raise ValueError(f"Got the wrong number of bytes for {byte_range=} of {url}")
+    return dest
+
+
+def _join_parts(parts: list[Path], dest: Path) -> None:
+    """
+    Concatenate the files ``parts`` (in order) into the file ``dest``, removing them.
+    """
+    parts[0].replace(dest)
+    with open(dest, "ab") as f:
+        for part in parts[1:]:
+            with open(part, "rb") as part_f:
+                shutil.copyfileobj(part_f, f)
+            part.unlink()
@@ -2,7 +2,7 @@ __all__ = ["BANNED_URLS"]
 
 _URL_PREFIX = "https://upload.wikimedia.org/wikipedia/commons/"
 
-BANNED_URLS = [
+BANNED_URLS = frozenset(
     f"{_URL_PREFIX}{url_part}"
     for url_part in (
         "5/50/50_Afghanis_of_Afghanistan_in_2002_Reverse.png",  # 404
@@ -12,4 +12,4 @@ BANNED_URLS = [
         "d/d2/StaatslijnC.png",  # 404
         "2/28/Logo_de_la_F%C3%A9d%C3%A9ration_de_Parkour.png",  # 404
     )
-]
+)
@@ -1,10 +1,31 @@
 from __future__ import annotations
 
-from io import SEEK_END, StringIO
+import mmap
+import os
+import re
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from io import SEEK_END
+from itertools import chain, islice
 from pathlib import Path
-from typing import Iterator, TextIO
+from typing import Callable, Iterator, TextIO
 
-__all__ = ["grep_backwards"]
+try:
+    import ahocorasick
+except ImportError:  # pragma: no cover
+    ahocorasick = None  # Fall back to matching a regex alternation of the patterns
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None  # type: ignore[assignment]  # Fall back to finding EOLs with ``rfind``
+
+__all__ = [
+    "grep_backwards",
+    "grep_backwards_multi",
+    "grep_backwards_mmap",
+    "grep_backwards_pread",
+]
 
 
 def grep_backwards(
@@ -12,7 +33,7 @@ def grep_backwards(
     match_substr: str,
     line_ending: str = "\n",
     strip_eol: bool = False,
-    step: int = 10,
+    step: int = 8 * 1024 * 1024,
 ) -> Iterator[str]:
     """
     Helper for scanning a file line by line from the end, imitating the behaviour of
@@ -24,81 +45,284 @@ def grep_backwards(
       match_substr  : Substring to match at. If given as the empty string, gives a
                       reverse line iterator rather than a reverse matching line iterator.
       line_ending   : The line ending to split lines on (default: "\n" newline)
-      strip_eol     : Whether to strip (default: ``True``) or keep (``False``) line
+      strip_eol     : Whether to strip (``True``) or keep (default: ``False``) line
                       endings off the end of the strings returned by the iterator.
-      step          : Number of characters to load into chunk buffer (i.e. chunk size)
+      step          : Number of characters to load into chunk buffer (i.e. chunk size).
+                      Defaults to 8 MiB; small files are read in a single chunk.
     """
+    if match_substr == "":
+        # Behave like `tac`, without testing for a match on every line
+        yield from _reverse_lines(fh, line_ending, strip_eol, step)
+        return
     # Store the end of file (EOF) position as we are advancing backwards from there
-    file_end_pos = fh.seek(0, SEEK_END)  # cursor has moved to EOF
-    # Keep a reversed string line buffer as we are writing right-to-left
-    revlinebuf = StringIO()
-    # Keep a [left-to-right] string buffer as we read left-to-right, one chunk at a time
-    chunk_buf = StringIO()
-    # Initialise 'last chunk start' at position after the EOF (unreachable by ``read``)
-    last_chunk_start = file_end_pos + 1
-    line_offset = 0  # relative to SEEK_END
-    has_EOF_newline = False  # may change upon finding first newline
+    chunk_end = fh.seek(0, SEEK_END)  # cursor has moved to EOF
+    if chunk_end == 0:
+        return  # An empty file has no lines to match
+    eol_len = len(line_ending)
+    has_eol = False  # The last line of the file has no line ending after it
+    # Keep the unprocessed head of the last chunk read, to append to the next chunk
+    chunk_tail = ""
     # In the worst case, seek all the way back to the start (position 0)
-    while last_chunk_start > 0:
-        # Ensure that read(size=step) will read at least 1 character
-        # e.g. when step=4, last_chunk_start=3, reduce step to 3 --> chunk=[0,1,2]
-        if step > last_chunk_start:
-            step = last_chunk_start
-        chunk_start = last_chunk_start - step
+    while chunk_end > 0:
+        chunk_start = max(chunk_end - step, 0)
         fh.seek(chunk_start)
-        # Read in the chunk for the current step (possibly after pre-existing chunks)
-        chunk_buf.write(fh.read(step))
-        while chunk := chunk_buf.getvalue():
-            # Keep reading intra-chunk lines RTL, leaving any leftovers in revlinebuf
-            lhs, EOL_match, rhs = chunk.rpartition(line_ending)
-            if EOL_match:
-                if line_offset == 0:
-                    has_EOF_newline = rhs == ""
-                # Reverse the right-hand-side of the rightmost line_ending and
-                # insert it after anything already in the reversed line buffer
-                if rhs:
-                    # Only bother writing rhs to line buffer if there's anything in it
-                    revlinebuf.write(rhs[::-1])
-                # Un-reverse the line buffer --> full line after the line_ending match
-                completed_line = revlinebuf.getvalue()[::-1]  # (may be empty string)
-                # Clear the reversed line buffer
-                revlinebuf.seek(0)
-                revlinebuf.truncate()
-                # `grep` if line matches (or behaves like `tac` if match_substr == "")
-                if line_offset == 0:
-                    if not has_EOF_newline and match_substr in completed_line:
-                        # The 0'th line from the end (by definition) cannot get an EOL
-                        yield completed_line
-                elif match_substr in (completed_line + line_ending):
-                    if not strip_eol:
-                        completed_line += line_ending
-                    yield completed_line
-                line_offset += 1
-            else:
-                # If line_ending not found in chunk then add entire [remaining] chunk,
-                # in reverse, onto the reversed line buffer, before chunk_buf is cleared
-                revlinebuf.write(chunk_buf.getvalue()[::-1])
-            # The LHS of the rightmost line_ending (if any) may contain another line
-            # ending so truncate the chunk to that and re-iterate (else clear chunk_buf)
-            chunk_buf.seek(len(lhs))
-            chunk_buf.truncate()
-        last_chunk_start = chunk_start
-    if completed_line := revlinebuf.getvalue()[::-1]:
-        # Iteration has reached the line at start of file, left over in the line buffer
-        if line_offset == 0 and not has_EOF_newline and match_substr in completed_line:
-            # The 0'th line from the end (by definition) cannot get an EOL
-            yield completed_line
-        elif match_substr in (
-            completed_line + (line_ending if line_offset > 1 or has_EOF_newline else "")
-        ):
-            if line_offset == 1:
-                if has_EOF_newline and not strip_eol:
-                    completed_line += line_ending
-            elif not strip_eol:
-                completed_line += line_ending
-            yield completed_line
-    else:
-        raise StopIteration
+        # Read in the chunk for the current step, completing any line split across it
+        chunk = fh.read(chunk_end - chunk_start) + chunk_tail
+        # Walk the line endings RTL (the end of the current line includes its EOL)
+        line_end = len(chunk)
+        search_end = line_end - eol_len if has_eol else line_end
+        while (i := chunk.rfind(line_ending, 0, search_end)) != -1:
+            line_start = i + eol_len
+            # Empty only for the (skipped) last line when the file ends in an EOL
+            if line_end > line_start:
+                # `grep` if line matches (including its EOL), testing it in place
+                if chunk.find(match_substr, line_start, line_end) != -1:
+                    if strip_eol and has_eol:
+                        line_end -= eol_len
+                    yield chunk[line_start:line_end]
+            has_eol = True
+            line_end, search_end = line_start, i
+        # The LHS of the leftmost line_ending (or the entire chunk, if none) is the end
+        # of a line that continues into the preceding chunk
+        chunk_tail = chunk[:line_end]
+        chunk_end = chunk_start
+    # Iteration has reached the line at start of file, left over in the chunk tail
+    if chunk_tail and match_substr in chunk_tail:
+        yield chunk_tail[:-eol_len] if strip_eol and has_eol else chunk_tail
+
+
+def _reverse_lines(
+    fh: TextIO, line_ending: str, strip_eol: bool, step: int
+) -> Iterator[str]:
+    """
+    Reverse line iterator (i.e. ``tac``) used by :func:`grep_backwards` when matching
+    all lines, walking the line endings of each chunk with ``rfind`` and no per-line
+    substring test.
+
+    Args:
+      fh            : The file handle to read from
+      line_ending   : The line ending to split lines on
+      strip_eol     : Whether to strip (``True``) or keep (``False``) line endings off
+                      the end of the strings returned by the iterator.
+      step          : Number of characters to read per chunk (i.e. chunk size)
+    """
+    eol_len = len(line_ending)
+    has_eol = False  # The last line of the file has no line ending after it
+    # Keep the unprocessed head of the last chunk read, to append to the next chunk
+    chunk_tail = ""
+    chunk_end = fh.seek(0, SEEK_END)
+    while chunk_end > 0:
+        chunk_start = max(chunk_end - step, 0)
+        fh.seek(chunk_start)
+        chunk = fh.read(chunk_end - chunk_start) + chunk_tail
+        # Walk the line endings RTL (the end of the current line includes its EOL)
+        line_end = len(chunk)
+        search_end = line_end - eol_len if has_eol else line_end
+        while (i := chunk.rfind(line_ending, 0, search_end)) != -1:
+            line_start = i + eol_len
+            # Empty only for the (skipped) last line when the file ends in an EOL
+            if line_end > line_start:
+                if strip_eol and has_eol:
+                    yield chunk[line_start : line_end - eol_len]
+                else:
+                    yield chunk[line_start:line_end]
+            has_eol = True
+            line_end, search_end = line_start, i
+        chunk_tail = chunk[:line_end]
+        chunk_end = chunk_start
+    # Iteration has reached the line at start of file, left over in the chunk tail
+    if chunk_tail:
+        yield chunk_tail[:-eol_len] if strip_eol and has_eol else chunk_tail
+
+
+def grep_backwards_multi(
+    fh: TextIO,
+    patterns: list[str],
+    line_ending: str = "\n",
+    strip_eol: bool = False,
+    step: int = 8 * 1024 * 1024,
+) -> Iterator[str]:
+    """
+    Like :func:`grep_backwards`, but matching lines containing any of several
+    substrings in a single pass over the file (rather than one pass per substring).
+    All patterns are tested at once with an Aho-Corasick automaton if
+    :mod:`ahocorasick` is installed, else with a compiled regex alternation.
+
+    Args:
+      fh            : The file handle to read from
+      patterns      : Substrings to match at. If any is the empty string, all lines
+                      match (i.e. a reverse line iterator).
+      line_ending   : The line ending to split lines on (default: "\n" newline)
+      strip_eol     : Whether to strip (``True``) or keep (default: ``False``) line
+                      endings off the end of the strings returned by the iterator.
+      step          : Number of characters to load into chunk buffer (i.e. chunk size)
+    """
+    if not patterns:
+        return
+    if "" in patterns:
+        yield from _reverse_lines(fh, line_ending, strip_eol, step)
+        return
+    is_match = _compile_matcher(patterns)
+    eol_len = len(line_ending)
+    # Match lines with their line endings, as patterns may include them
+    for line in _reverse_lines(fh, line_ending, False, step):
+        if is_match(line):
+            if strip_eol and line.endswith(line_ending):
+                line = line[:-eol_len]
+            yield line
+
+
+def _compile_matcher(patterns: list[str]) -> Callable[[str], bool]:
+    """
+    Build a function to test whether a string contains any of ``patterns``.
+
+    Args:
+      patterns : The (non-empty) substrings to match
+    """
+    if ahocorasick is None:
+        regex = re.compile("|".join(map(re.escape, patterns)))
+        return lambda line: regex.search(line) is not None
+    automaton = ahocorasick.Automaton()
+    for idx, pattern in enumerate(patterns):
+        automaton.add_word(pattern, idx)
+    automaton.make_automaton()
+    return lambda line: next(automaton.iter(line), None) is not None
+
+
+def grep_backwards_mmap(
+    path: Path,
+    match_substr: bytes,
+    line_ending: bytes = b"\n",
+    strip_eol: bool = False,
+    encoding: str = "utf-8",
+    step: int = 8 * 1024 * 1024,
+) -> Iterator[str]:
+    """
+    Like :func:`grep_backwards`, but scanning a file on disk as bytes via a read-only
+    memory map rather than through text mode chunk buffers. The kernel pages in only
+    the end of the file that the iterator actually reaches, and only matching lines
+    are copied out of the map (and decoded).
+
+    Args:
+      path          : The path of the file to read from
+      match_substr  : Substring to match at. If given as the empty bytestring, gives a
+                      reverse line iterator rather than a reverse matching line iterator.
+      line_ending   : The line ending to split lines on (default: b"\n" newline)
+      strip_eol     : Whether to strip (``True``) or keep (default: ``False``) line
+                      endings off the end of the strings returned by the iterator.
+      encoding      : The encoding to decode matching lines with (default: UTF-8)
+      step          : Number of bytes to search for line endings at a time (when
+                      vectorised with numpy)
+    """
+    with open(path, "rb") as fh:
+        if fh.seek(0, SEEK_END) == 0:
+            return  # An empty file cannot be memory-mapped (and has no lines)
+        with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            eol_len = len(line_ending)
+            # Position of the line ending at the end of the current line (initially the
+            # EOF, as the last line of the file has no line ending after it)
+            pos = file_end = len(mm)
+            # Finish on the first line, which has no line ending before it
+            for i in chain(_rfind_line_endings(mm, line_ending, step), [-1]):
+                line_start = 0 if i == -1 else i + eol_len
+                line_end = pos if pos == file_end else pos + eol_len
+                # Empty only for the (skipped) last line when the file ends in an EOL
+                if line_end > line_start:
+                    # Match in place, only copying matched lines out of the map
+                    if mm.find(match_substr, line_start, line_end) != -1:
+                        line = mm[line_start : pos if strip_eol else line_end]
+                        yield line.decode(encoding)
+                pos = i
+
+
+def _rfind_line_endings(mm: mmap.mmap, line_ending: bytes, step: int) -> Iterator[int]:
+    """
+    Iterate over the positions of ``line_ending`` in ``mm`` from the end. Single byte
+    line endings are located a chunk of ``step`` bytes at a time in one vectorised pass
+    with numpy (if installed), otherwise one at a time with ``rfind``.
+    """
+    if np is None or len(line_ending) != 1:
+        pos = len(mm)
+        while (pos := mm.rfind(line_ending, 0, pos)) != -1:
+            yield pos
+        return
+    eol_byte = line_ending[0]
+    chunk_end = len(mm)
+    while chunk_end > 0:
+        chunk_start = max(chunk_end - step, 0)
+        chunk = np.frombuffer(mm[chunk_start:chunk_end], dtype=np.uint8)
+        eol_positions = np.flatnonzero(chunk == eol_byte) + chunk_start
+        yield from reversed(eol_positions.tolist())
+        chunk_end = chunk_start
+
+
+def grep_backwards_pread(
+    path: Path,
+    match_substr: bytes,
+    line_ending: bytes = b"\n",
+    strip_eol: bool = False,
+    encoding: str = "utf-8",
+    step: int = 8 * 1024 * 1024,
+    n_inflight: int = 4,
+) -> Iterator[str]:
+    """
+    Like :func:`grep_backwards_mmap`, but reading the file in chunks with positional
+    reads (``os.pread``), kept ``n_inflight`` chunks ahead of the one being scanned in a
+    thread pool so that waiting on the disk overlaps with scanning. Useful when the file
+    is not already in the page cache (e.g. reverse scanning many large files on a cold
+    disk). Falls back to :func:`grep_backwards_mmap` where ``os.pread`` is unavailable.
+
+    Args:
+      path          : The path of the file to read from
+      match_substr  : Substring to match at. If given as the empty bytestring, gives a
+                      reverse line iterator rather than a reverse matching line iterator.
+      line_ending   : The line ending to split lines on (default: b"\n" newline)
+      strip_eol     : Whether to strip (``True``) or keep (default: ``False``) line
+                      endings off the end of the strings returned by the iterator.
+      encoding      : The encoding to decode matching lines with (default: UTF-8)
+      step          : Number of bytes to read per chunk (i.e. chunk size)
+      n_inflight    : Number of chunk reads to have in progress at once
+    """
+    if not hasattr(os, "pread"):
+        yield from grep_backwards_mmap(
+            path, match_substr, line_ending, strip_eol, encoding, step
+        )
+        return
+    eol_len = len(line_ending)
+    has_eol = False  # The last line of the file has no line ending after it
+    # Keep the unprocessed head of the last chunk read, to append to the next chunk
+    chunk_tail = b""
+    with open(path, "rb") as fh, ThreadPoolExecutor(n_inflight) as pool:
+        fd = fh.fileno()
+        chunk_starts = reversed(range(0, os.fstat(fd).st_size, step))
+        reads = deque(
+            pool.submit(os.pread, fd, step, start)
+            for start in islice(chunk_starts, n_inflight)
+        )
+        while reads:
+            chunk = reads.popleft().result() + chunk_tail
+            if (next_start := next(chunk_starts, None)) is not None:
+                reads.append(pool.submit(os.pread, fd, step, next_start))
+            # Walk the line endings RTL (the end of the current line includes its EOL)
+            line_end = len(chunk)
+            search_end = line_end - eol_len if has_eol else line_end
+            while (i := chunk.rfind(line_ending, 0, search_end)) != -1:
+                line_start = i + eol_len
+                # Empty only for the (skipped) last line when the file ends in an EOL
+                if line_end > line_start:
+                    # Match in place, only copying matched lines out of the chunk
+                    if chunk.find(match_substr, line_start, line_end) != -1:
+                        if strip_eol and has_eol:
+                            line_end -= eol_len
+                        yield chunk[line_start:line_end].decode(encoding)
+                has_eol = True
+                line_end, search_end = line_start, i
+            chunk_tail = chunk[:line_end]
+    # Iteration has reached the line at start of file, left over in the chunk tail
+    if chunk_tail and match_substr in chunk_tail:
+        if strip_eol and has_eol:
+            chunk_tail = chunk_tail[:-eol_len]
+        yield chunk_tail.decode(encoding)
 
 
 def rudimentary_grep_test():
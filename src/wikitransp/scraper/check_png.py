@@ -2,141 +2,170 @@ from __future__ import annotations
 
 import asyncio
 import csv
-from functools import partial
 import gc
-import gzip
-from itertools import chain
-import json
 import logging
+import mmap
 import multiprocessing as mp
+import os
+import re
+import struct
 import subprocess
 import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from itertools import count
+from operator import itemgetter
 from pathlib import Path
-from typing import TYPE_CHECKING, TextIO
+from typing import (
+    IO,
+    TYPE_CHECKING,
+    BinaryIO,
+    Callable,
+    Iterable,
+    Iterator,
+    Sequence,
+)
 
 import range_streams
-import requests
-from aiostream.core import StreamEmpty
 from range_streams import RangeStream
 from range_streams.codecs import PngStream
 from tqdm import tqdm
 
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    from pyarrow import csv as pa_csv
+except ImportError:  # pragma: no cover
+    pa = None  # Fall back to filtering rows one at a time in Python
+
 MYPY = False  # when using mypy will be overrided as True
 if MYPY or not TYPE_CHECKING:  # pragma: no cover
     import httpx  # avoid importing to Sphinx type checker
 
+from ..data import open_wit_shard
+from ..data.shards import _open_binary
 from ..logs import _dir_path as logs_dir
-from ..share.multiproc_utils import batch_multiprocess_with_return
+from .async_utils import _run_tasks
 from .ban_list import BANNED_URLS
+from .clients import make_client
 from .logger import Log, Logger
+from .png_alpha import _PNG_SIGNATURE, confirm_idat_alpha
+from .seen_cache import SeenCache
+from .thumbnail import (
+    _DEFAULT_THUMB_WIDTH,
+    _WPC_HOST_PATH,
+    _WPC_PREFIX,
+    get_png_thumbnail_url,
+)
+from .tsv_fields import TSV_FIELDS
 
 __all__ = ["filter_tsv_rows"]
 
 
-_DEFAULT_THUMB_WIDTH = 100
 _MIN_WIDTH_HEIGHT = 1000
+_THUMB_BYPASS_FACTOR = 2  # Use PNGs up to this many times the thumbnail width as is
 _MAX_WIDTH_HEIGHT = 0
+_TSV_CHUNK_SIZE = 64 * 1024 * 1024  # Bytes of (uncompressed) TSV per parallel task
+_QUEUE_SIZE = 4096  # PNGs waiting to be checked, beyond which filtering pauses
+_N_CHECKERS = 64  # PNGs checked concurrently
+_IHDR_END = 33  # PNG signature (8 bytes) and IHDR chunk (length, type, 13, CRC)
+_IHDR_FETCH_LIMIT = 100  # Requests in flight at once when reading a batch of IHDRs
+_IHDR_BATCH_SIZE = 16  # PNGs each checker takes off the queue to read the IHDRs of
+_RGBA_COLOUR_TYPE = 6  # i.e. 4 channels (truecolour with alpha)
+_CHANNEL_COUNTS = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}  # {PNG colour type: channel count}
+_SEEN_CACHE_FILENAME = "seen.sqlite"  # In the logs directory
+_WRITE_BUFFER_SIZE = 1 << 20  # 1 MiB, so the output TSV is written in few syscalls
+_GC_INTERVAL = 512  # Number of PNGs checked between collections of the youngest objects
+_FULL_GC_INTERVAL = _GC_INTERVAL * 64  # Number of PNGs checked between full collections
+# Matches a Wikipedia Commons URL, capturing its subdirectories and filename
+_WPC_URL_REGEX = rf"^https?://{re.escape(_WPC_HOST_PATH)}(.*/)?([^/]*)$"
+_TABLE_BLOCK_SIZE = 1 << 22  # 4 MiB
+_PNG_MIME_FIELD = b"\timage/png\t"
+# Read each line of a TSV as a single column with pyarrow, by splitting on a character
+# the dataset's text doesn't contain (any line which does is handled separately)
+_LINE_DELIMITER = "\x1f"
 
 LOG_FILTER = None
 # LOG_FILTER = [Log.CheckPng, Log.AverageTime, Log.GarbageCollect, Log.PngDone]
+# Whether to log the time taken by each step of checking each PNG: several events per
+# PNG, so this is only worth its overhead when debugging (set the environment variable)
+LOG_TIMINGS = bool(os.environ.get("WIKITRANSP_LOG_TIMINGS"))
 
 log: Logger  # set as global variable in `filter_tsv_rows`
+_png_counter = count(1)  # Counts PNGs checked, to space out garbage collection
 
 
-class TSV_FIELDS:
-    LANG = 0
-    PAGE_URL = 1
-    IMAGE_URL = 2
-    PAGE_TITLE = 3
-    SECTION_TITLE = 4
-    HIERARCHICAL_SECTION_TITLE = 5
-    CAPTION_REFERENCE_DESCRIPTION = 6
-    CAPTION_ATTRIBUTION_DESCRIPTION = 7
-    CAPTION_ALT_TEXT_DESCRIPTION = 8
-    MIME_TYPE = 9
-    ORIGINAL_HEIGHT = 10
-    ORIGINAL_WIDTH = 11
-    IS_MAIN_IMAGE = 12
-    ATTRIBUTION_PASSES_LANG_ID = 13
-    PAGE_CHANGED_RECENTLY = 14
-    CONTEXT_PAGE_DESCRIPTION = 15
-    CONTEXT_SECTION_DESCRIPTION = 16
-
-
-def get_png_thumbnail_url(png_url: str, width: int = _DEFAULT_THUMB_WIDTH, guess=True):
-    f"""
-    Given the full URL of a PNG of an image on Wikipedia Commons ``png_url``, extract
-    its filename and use that to create a thumbnail URL with the given ``width``.
+# The indices of the fields used to filter rows
+_TABLE_FIELDS = [
+    TSV_FIELDS.MIME_TYPE,
+    TSV_FIELDS.IMAGE_URL,
+    TSV_FIELDS.ORIGINAL_HEIGHT,
+    TSV_FIELDS.ORIGINAL_WIDTH,
+]
 
-    Note: if the width of the PNG at the input URL is less than or equal to the
-    requested thumbnail ``width``, the API will simply return the input URL
-    (but without loading the input URL, it's not possible to know this in advance).
 
-    Args:
-      png_url : URL of a PNG under ``https://upload.wikimedia.org/wikipedia/commons/``
-      width   : The desired output thumbnail's width (default:
-                ``{_DEFAULT_THUMB_WIDTH=}``px)
-      guess   : Whether to simply guess using the standard format (avoiding the
-                need to wait for the API call).
+async def quick_ihdr(url: str, client: httpx.AsyncClient) -> tuple[int, int, int, int]:
     """
-    filename = png_url[png_url.rfind("/") + 1 :]
-    if guess:
-        wpc_prefix = "https://upload.wikimedia.org/wikipedia/commons/"
-        if png_url.startswith("http://"):
-            png_url = png_url.replace("http://", "https://")
-        if not png_url.startswith(wpc_prefix):
-            # The input URL doesn't match expected format, so don't try to guess
-            guess = False  # Resort to the API call in the next conditional block
-        else:
-            subdirs = png_url[len(wpc_prefix) : -len(filename)]
-            thumb_url = f"{wpc_prefix}thumb/{subdirs}{filename}/{width}px-{filename}"
-    if not guess:
-        api_url = (
-            "https://en.wikipedia.org/w/api.php?"
-            "action=query&format=json"
-            "&prop=imageinfo"
-            f"&titles=File:{filename}"
-            f"&iiurlwidth={width}"
-            "&iiprop=url"
-        )
-        r = requests.get(api_url)
-        j = json.loads(r.content)
-        try:
-            thumb_url = j["query"]["pages"]["-1"]["imageinfo"][0]["thumburl"]
-        except:
-            # Want to know which URLs don't conform if any
-            raise ValueError(f"{api_url=} does not conform")
-    return thumb_url
+    Read the width, height, bit depth and colour type of the PNG at ``url`` from its
+    IHDR chunk, which is always at the start of the file, with a single range request
+    for just those first 33 bytes (rather than enumerating the PNG's chunks with
+    :class:`~range_streams.codecs.png.PngStream`). Only if the colour type is RGBA
+    (``6``) is there any need to check the image data for transparency.
 
-
-def confirm_idat_alpha(stream: PngStream, nonzero: bool = True) -> bool:
+    Args:
+      url    : The URL of the PNG
+      client : The client to send the request with
     """
-    Download the image data for a PNG image -- i.e. its IDAT chunk(s) -- and determine
-    whether or not there is any non-maximum alpha value therein. This is to distinguish
-    an image with an alpha channel (RGBA), but with all ``255`` values in that channel,
-    from an image with an alpha channel and actual transparent or semitransparent
-    pixels. It is recommended to pass in a thumbnail if possible to speed up this step.
-
-    If the image uses an indexed palette and tRNS chunk rather than IDAT chunk RGBA
-    values, this can't be checked, so assume it has transparency.
-
-    Presumes :meth:`~range_streams.codecs.png.PngStream.alpha_as_direct` has already
-    been called, to check the PNG has the possibility of an alpha channel before
-    this function 'confirms' the channel is effectively used (rather than being entirely
-    ``255``, fully opaque and non-transparent) by checking the IDAT chunks themselves.
+    headers = {"Range": f"bytes=0-{_IHDR_END - 1}"}
+    head = b""
+    async with client.stream("GET", url, headers=headers) as response:
+        response.raise_for_status()
+        # Stop reading early in case the server ignores the range and sends everything
+        async for chunk in response.aiter_bytes():
+            head += chunk
+            if len(head) >= _IHDR_END:
+                break
+    if not head.startswith(_PNG_SIGNATURE) or head[12:16] != b"IHDR":
+        raise ValueError(f"No PNG IHDR chunk at the start of {url}")
+    width, height, bit_depth, colour_type = struct.unpack(">IIBB", head[16:26])
+    return width, height, bit_depth, colour_type
+
+
+async def fetch_ihdrs(
+    urls: list[str],
+    client: httpx.AsyncClient,
+    limit: int = _IHDR_FETCH_LIMIT,
+    semaphore: asyncio.Semaphore | None = None,
+) -> list[tuple[int, int, int, int] | BaseException]:
+    """
+    Read the IHDR of each of a batch of PNGs (see :func:`quick_ihdr`) concurrently,
+    up to ``limit`` at a time: with HTTP/2, many requests to the same host share one
+    connection, so the batch takes a few round trips rather than one per PNG. The URLs
+    are requested in order of their host, so those to the same host are in flight
+    together (servers that don't support HTTP/2 are negotiated down to HTTP/1.1).
 
-    For simplicity, do not bother handling indexed PNGs (whose channel count will be 1),
-    only those with 4 channels in the IDAT data will be used (so indexed PNGs with
-    transparency will not be accepted, and return ``False`` from this method).
+    Returns the IHDR fields of each PNG, or the error raised in reading them, in the
+    order of ``urls``.
 
     Args:
-      stream  : The :class:`~range_streams.codecs.png.PngStream` whose IDAT chunk(s)
-                will be checked for the image data's alpha channel, or lack thereof.
-      nonzero : If ``True`` (the default), checks specifically for semitransparency.
-                If ``False``, checks for any transparency (i.e. any non-opacity).
+      urls      : The URLs of the PNGs
+      client    : The client to send the requests with
+      limit     : The maximum number of requests in flight at once
+      semaphore : A semaphore to limit the requests with instead of ``limit`` (to
+                  share the limit across batches fetched at the same time)
     """
-    rgba_check = stream.data.IHDR.channel_count == 4
-    return rgba_check and stream.any_semitransparent_idat(nonzero=nonzero)
+    ihdr_limit = semaphore or asyncio.Semaphore(limit)
+
+    async def fetch_ihdr(url: str) -> tuple[int, int, int, int]:
+        async with ihdr_limit:
+            return await quick_ihdr(url, client)
+
+    by_host = sorted(range(len(urls)), key=lambda i: httpx.URL(urls[i]).host)
+    ihdrs = await asyncio.gather(
+        *(fetch_ihdr(urls[i]) for i in by_host), return_exceptions=True
+    )
+    results = dict(zip(by_host, ihdrs))
+    return [results[i] for i in range(len(urls))]
 
 
 def filter_tsv_rows(
@@ -147,6 +176,7 @@ def filter_tsv_rows(
     min_size=_MIN_WIDTH_HEIGHT,
     max_size=_MAX_WIDTH_HEIGHT,
     fetch_async: bool = True,
+    concurrency: int = _N_CHECKERS,
 ) -> Path:
     f"""
     Check the PNGs in the WIT dataset (made up of TSV files) by
@@ -170,12 +200,14 @@ def filter_tsv_rows(
       max_size        : The maximum width and height of image to filter for. Default:
                         ``{_MAX_WIDTH_HEIGHT=}``px. Ignored if ``0`` or below.
       fetch_async     : Whether to use asynchronous partial requests to fetch PNGs.
+      concurrency     : The number of PNGs to check concurrently. Default:
+                        ``{_N_CHECKERS=}``.
     """
     if (resume_at is not None) and (resume_after is not None):
         raise ValueError(f"Got passed values for both {resume_at=} and {resume_after=}")
     skip_resume_url = resume_after is not None
     resume_at_url = resume_after if skip_resume_url else resume_at
-    tsv_out_mode = "w" if resume_at_url is None else "a"
+    tsv_out_mode = "wb" if resume_at_url is None else "ab"
     if len(input_tsv_files) == 0:
         raise ValueError("No TSV files to filter")
     first_tsv = input_tsv_files[0]
@@ -192,6 +224,8 @@ def filter_tsv_rows(
     log_path = logs_dir / f"{out_path.stem}.log"
     total_tsvs = len(input_tsv_files)
     n_tsv = f"{total_tsvs} TSV file{'s' if total_tsvs > 1 else ''}"
+    # Move everything allocated so far (modules, etc.) out of garbage collection
+    gc.freeze()
     global log  # global singleton
     log = Logger(
         which=LOG_FILTER,
@@ -199,38 +233,325 @@ def filter_tsv_rows(
         name=__name__,
     )
     # logging.helper = log # global now
-    # Make and immediately dispose of an empty RangeStream to get a persistent client
-    # without having to import httpx at all (which avoids Sphinx type import hassle)
-    client = httpx.AsyncClient() if fetch_async else httpx.Client()
+    seen_cache = SeenCache(logs_dir / _SEEN_CACHE_FILENAME)
+    # Only collect garbage periodically (see `collect_garbage`), not per allocation
+    gc.disable()
     try:
-        with open(out_path, tsv_out_mode) as tsv_out:
-            tsvwriter = csv.writer(tsv_out, delimiter="\t")
-            tsv_filter_funcs = [
-                partial(
-                    handle_tsv_file,
-                    tsv_path=tsv_path,
-                    thumbnail_width=thumbnail_width,
-                    min_size=min_size,
-                    max_size=max_size,
-                )
-                for tsv_path in input_tsv_files
-            ]
-            # The URL collection functions have been gathered, now run them on all cores
-            url_lists = [*chain.from_iterable(
-                batch_multiprocess_with_return(tsv_filter_funcs, show_progress=True)
-            )]
-            breakpoint()
-            # Now the URLs have been collected, fetch in a single async multiprocess run
+        with open(out_path, tsv_out_mode, buffering=_WRITE_BUFFER_SIZE) as tsv_out:
+            handle_chunk = partial(
+                handle_tsv_chunk,
+                thumbnail_width=thumbnail_width,
+                min_size=min_size,
+                max_size=max_size,
+            )
+            pipeline = run_pipeline(
+                chunk_specs=tsv_chunk_specs(input_tsv_files),
+                handle_chunk=handle_chunk,
+                tsv_out=tsv_out,
+                seen_cache=seen_cache,
+                skip_accepted=tsv_out_mode == "ab",
+                screen_async=fetch_async,
+                n_checkers=concurrency,
+            )
+            asyncio.run(pipeline)
     except KeyboardInterrupt:
         log.halt()
         raise
     else:
         log.complete()
+    finally:
+        # Return the objects frozen above to the collector, so a caller which goes on
+        # to do more work doesn't keep them (and all they refer to) forever
+        gc.unfreeze()
+        gc.enable()
+        seen_cache.close()
     return out_path
 
 
-async def finish_async(client):
-    await client.aclose()
+async def run_pipeline(
+    chunk_specs: list[tuple[Path, int, int | None]],
+    handle_chunk: Callable[
+        [tuple[Path, int, int | None]], tuple[list[str], list[str], list[str]]
+    ],
+    tsv_out: IO[bytes],
+    seen_cache: SeenCache,
+    skip_accepted: bool = False,
+    screen_async: bool = True,
+    n_checkers: int = _N_CHECKERS,
+) -> None:
+    """
+    Filter the rows of the TSV chunks on all CPU cores, while checking the PNGs from
+    the chunks already filtered, so that neither the network nor the CPU sits idle.
+
+    Each chunk is filtered in a process pool by a producer task, which puts the PNGs
+    it returns onto a queue (dropping those seen in earlier chunks). The queue is
+    bounded so that filtering pauses if checking falls behind, rather than keeping
+    every row in memory. ``n_checkers`` consumer tasks take batches of PNGs off the
+    queue, screen out those without an alpha channel by their IHDR chunk (read for
+    the whole batch at once, see :func:`fetch_ihdrs`), and check the rest for
+    transparency (see :func:`check_png_alpha`). The dataset
+    row of each PNG with transparency is written (unchanged) to the output TSV. URLs
+    rejected on a previous run (according to ``seen_cache``, loaded into memory up
+    front) are not checked again, nor (if ``skip_accepted``) are those accepted.
+
+    Args:
+      chunk_specs   : The TSV file chunks (see :func:`tsv_chunk_specs`)
+      handle_chunk  : The function to filter a TSV chunk with, returning the URLs of
+                      PNGs to check and (in parallel) of their thumbnails and their
+                      rows (picklable, to run in a subprocess: see
+                      :func:`handle_tsv_chunk`)
+      tsv_out       : The TSV output file, opened for writing bytes
+      seen_cache    : The cache to look up and record the outcomes of checks in
+      skip_accepted : Whether to skip URLs accepted on a previous run (when
+                      appending to its output, which already has their rows)
+      screen_async  : Whether to screen the PNGs by their IHDR with async requests
+                      before checking them (else every PNG is checked in full).
+      n_checkers    : The number of PNGs to check concurrently.
+    """
+    loop = asyncio.get_running_loop()
+    # The image data checks run in threads, so they need as many as there are checkers
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=n_checkers))
+    # The thumbnail URL and dataset row of each PNG to check
+    queue: asyncio.Queue[tuple[str, str] | None] = asyncio.Queue(_QUEUE_SIZE)
+    seen: set[str] = set()  # Drop URLs duplicated across chunks (or files)
+    skipped = seen_cache.skippable_urls(include_accepted=skip_accepted)
+    client = make_client(fetch_async=True)
+    sync_client = make_client(fetch_async=False)  # PngStream's async support is WIP
+    ihdr_limit = asyncio.Semaphore(_IHDR_FETCH_LIMIT)  # Shared by all the checkers
+    if LOG_TIMINGS:
+        log.add(Log.PrePngStreamAsyncFetcher)  # Here this is once for all the URLs
+
+    async def produce(spec: tuple[Path, int, int | None]) -> None:
+        png_urls, thumb_urls, rows = await loop.run_in_executor(
+            executor, handle_chunk, spec
+        )
+        for png_url, thumb_url, row in zip(png_urls, thumb_urls, rows):
+            if png_url not in seen:
+                seen.add(png_url)
+                if thumb_url not in skipped:
+                    await queue.put((thumb_url, row))
+        progress.update()
+
+    async def consume() -> None:
+        stopped = False
+        while not stopped:
+            # Wait for a PNG, then take any others waiting (up to a batch, and not past
+            # a stop signal, which is then this checker's own)
+            batch = [await queue.get()]
+            while (
+                batch[-1] is not None
+                and len(batch) < _IHDR_BATCH_SIZE
+                and not queue.empty()
+            ):
+                batch.append(queue.get_nowait())
+            stopped = batch[-1] is None
+            pngs = [png for png in batch if png is not None]
+            if not pngs:
+                continue
+            thumb_urls = [thumb_url for thumb_url, _ in pngs]
+            ihdrs: Sequence[tuple[int, int, int, int] | BaseException | None]
+            if screen_async:
+                ihdrs = await fetch_ihdrs(thumb_urls, client, semaphore=ihdr_limit)
+            else:
+                ihdrs = [None] * len(pngs)
+            for (thumb_url, row), ihdr in zip(pngs, ihdrs):
+                if await check_png(thumb_url, ihdr, sync_client, seen_cache):
+                    # The row is written as it was read (no field has a tab or newline)
+                    tsv_out.write(f"{row}\n".encode())
+                    log.add(Log.WriteRow, since=Log.ConfAlpha if LOG_TIMINGS else None)
+                if LOG_TIMINGS:
+                    log.add(Log.PngDone, prefix=":-) ")
+                collect_garbage()
+
+    try:
+        with ProcessPoolExecutor(initializer=gc.enable) as executor, tqdm(
+            total=len(chunk_specs)
+        ) as progress:
+            checkers = [asyncio.create_task(consume()) for _ in range(n_checkers)]
+            try:
+                await _run_tasks([produce(spec) for spec in chunk_specs])
+                for _ in checkers:
+                    await queue.put(None)  # Stop each checker once the queue is empty
+                await asyncio.gather(*checkers)
+            finally:
+                for checker in checkers:
+                    checker.cancel()  # Only affects checkers left pending by an error
+    finally:
+        await client.aclose()
+        sync_client.close()
+
+
+async def check_png(
+    url: str,
+    ihdr: tuple[int, int, int, int] | BaseException | None,
+    sync_client: httpx.Client,
+    seen_cache: SeenCache,
+) -> bool:
+    """
+    Check whether the PNG at ``url`` has semitransparent pixels, logging rather than
+    raising any error in doing so (in which case it is taken not to), and recording
+    the outcome in ``seen_cache``. A 404 response indicates that the PNG's URL should
+    be added to the banned URLs.
+
+    Args:
+      url         : The URL of the PNG (or its thumbnail)
+      ihdr        : The fields of the PNG's IHDR chunk (or the error in reading them)
+                    from :func:`fetch_ihdrs`, to screen it by before checking its image
+                    data, or ``None`` to check its image data without screening it
+      sync_client : The client to check the PNG's image data with (in a thread)
+      seen_cache  : The cache to record the outcome of the check in
+    """
+    loop = asyncio.get_running_loop()
+    channels = None
+    try:
+        if isinstance(ihdr, BaseException):
+            raise ihdr  # Handled along with any error in checking the image data
+        if ihdr is not None:
+            *_, colour_type = ihdr
+            channels = _CHANNEL_COUNTS.get(colour_type)
+            if colour_type != _RGBA_COLOUR_TYPE:
+                seen_cache.record(url, httpx.codes.OK, channels=channels)
+                return False  # Don't want indexed so must have 4 channels
+        alpha = await loop.run_in_executor(None, check_png_alpha, url, sync_client)
+        seen_cache.record(url, httpx.codes.OK, channels=channels, alpha=alpha)
+        return alpha
+    except httpx.HTTPStatusError as exc:
+        status_code = exc.response.status_code
+        seen_cache.record(url, status_code)
+        if status_code == 404:
+            # Note this is the thumbnail URL not the source URL in the dataset
+            msg = "Add to banned URLs (status code %d): %s"
+            log.add(Log.BanURL, msg, status_code, url)
+        else:
+            log.error(Log.URLException, f"(status code {status_code}): {url}")
+    except Exception as exc:
+        log.error(Log.RoutineException, err=exc)
+        log.error(Log.BanURLException, f"Possibly add to banned URLs: {url}")
+    return False
+
+
+def check_png_alpha(url: str, client: httpx.Client) -> bool:
+    """
+    Check whether the PNG at ``url`` has an alpha channel, and if so whether it has
+    any semitransparent pixels, with a :class:`~range_streams.codecs.png.PngStream`.
+
+    Args:
+      url    : The URL of the PNG (or its thumbnail)
+      client : The client to fetch the PNG's chunks with
+    """
+    p = make_png_stream(url=url, client=client)
+    try:
+        if p.data.IHDR.channel_count != 4:
+            return False  # Don't want indexed so must have 4 channels
+        # No need to enumerate the chunks: an RGBA PNG's alpha channel is in its IDAT
+        direct_alpha = p.alpha_as_direct
+        if LOG_TIMINGS:
+            log.add(Log.DirectAlpha, since=Log.PngStream)
+        if not direct_alpha:
+            if LOG_TIMINGS:
+                log.add(Log.DirectAlphaNeg, since=Log.DirectAlpha)
+            return False
+        alpha = confirm_idat_alpha(stream=p)
+        if LOG_TIMINGS:
+            which = Log.ConfAlpha if alpha else Log.ConfAlphaNeg
+            log.add(which, since=Log.DirectAlpha)
+        return alpha
+    finally:
+        p.close()
+
+
+def tsv_chunk_specs(
+    tsv_paths: list[Path], chunk_size: int = _TSV_CHUNK_SIZE
+) -> list[tuple[Path, int, int | None]]:
+    """
+    Split the TSV files into byte ranges to be processed in parallel, so that a few
+    large files don't leave most CPU cores idle. Each is given as ``(path, start,
+    end)``. Gzip-compressed files (which cannot be read from an offset without first
+    decompressing up to it) are each given whole, with an ``end`` of ``None``, as are
+    all files when :mod:`pyarrow` is installed (as it reads a file across all cores).
+
+    Args:
+      tsv_paths  : The TSV file paths (gzipped or uncompressed)
+      chunk_size : The number of bytes in each range of an uncompressed TSV
+    """
+    specs: list[tuple[Path, int, int | None]] = []
+    for path in tsv_paths:
+        if pa is not None or path.suffix == ".gz":
+            specs.append((path, 0, None))
+        else:
+            size = path.stat().st_size
+            specs.extend(
+                (path, start, min(start + chunk_size, size))
+                for start in range(0, size, chunk_size)
+            )
+    return specs
+
+
+def handle_tsv_chunk(
+    spec: tuple[Path, int, int | None],
+    thumbnail_width: int,
+    min_size: int,
+    max_size: int,
+) -> tuple[list[str], list[str], list[str]]:
+    """
+    Process the rows of a TSV file within a byte range (see :func:`tsv_chunk_specs`).
+    The rows belonging to a range are those which start within it (a row which starts
+    exactly at the end of a range is included in it), so a range not at the start of
+    the file begins after the first line break.
+
+    Args:
+      spec            : The TSV file path, start, and end of the byte range (if the end
+                        is ``None``, the entire file is processed)
+      thumbnail_width : The width of the thumbnail to generate when verifying an
+                        image with RGBA channels actually contains alpha transparency.
+      min_size        : The minimum width and height of image to filter for. Default:
+                        ``{_MIN_WIDTH_HEIGHT=}``px. Ignored if ``0`` or below.
+      max_size        : The maximum width and height of image to filter for. Default:
+                        ``{_MAX_WIDTH_HEIGHT=}``px. Ignored if ``0`` or below.
+    """
+    tsv_path, start, end = spec
+    if end is None:
+        return handle_tsv_file(tsv_path, thumbnail_width, min_size, max_size)
+    with open(tsv_path, "rb") as f, mmap.mmap(
+        f.fileno(), 0, access=mmap.ACCESS_READ
+    ) as mm:
+        if hasattr(mm, "madvise"):
+            mm.madvise(mmap.MADV_SEQUENTIAL)  # Read ahead aggressively
+        return handle_tsv_data(
+            fh=_iter_png_lines(mm, start, end),
+            thumbnail_width=thumbnail_width,
+            min_size=min_size,
+            max_size=max_size,
+            has_header=False,  # The column label row is not a PNG row so is skipped
+        )
+
+
+def _iter_png_lines(buf: mmap.mmap, start: int, end: int) -> Iterator[str]:
+    """
+    Iterate over the (decoded) lines of a memory-mapped TSV which start within a byte
+    range (see :func:`handle_tsv_chunk`) and have a field which is ``image/png``. Other
+    lines (i.e. most of them) are neither copied out of the map nor decoded.
+
+    Args:
+      buf   : The memory-mapped TSV file
+      start : The position in the file from which to find the first line to start
+      end   : The position in the file after which to stop
+    """
+    if start > 0:
+        # The line straddling (or starting at) the start belongs to the previous range
+        pos = buf.find(b"\n", start) + 1
+        if pos == 0:
+            return  # No line starts in the range
+    else:
+        pos = 0
+    size = len(buf)
+    while pos <= end and pos < size:
+        eol = buf.find(b"\n", pos)
+        if eol == -1:
+            eol = size
+        if buf.find(_PNG_MIME_FIELD, pos, eol) != -1:
+            yield buf[pos:eol].decode("utf-8")
+        pos = eol + 1
 
 
 def handle_tsv_file(
@@ -238,9 +559,11 @@ def handle_tsv_file(
     thumbnail_width: int,
     min_size: int,
     max_size: int,
-) -> list[str]:
+) -> tuple[list[str], list[str], list[str]]:
     """
-    Open and process the TSV file (in this function just handle its compression).
+    Open and process the TSV file (in this function just handle its compression). If
+    :mod:`pyarrow` is installed, the rows are filtered with it in columnar form rather
+    than one at a time.
 
     Args:
       tsv_path        : path to the TSV file (gzipped or uncompressed)
@@ -251,42 +574,54 @@ def handle_tsv_file(
       max_size        : The maximum width and height of image to filter for. Default:
                         ``{_MAX_WIDTH_HEIGHT=}``px. Ignored if ``0`` or below.
     """
+    if pa is not None:
+        return handle_tsv_table(
+            tsv_path=tsv_path,
+            thumbnail_width=thumbnail_width,
+            min_size=min_size,
+            max_size=max_size,
+        )
     with tsv_opener(tsv_path) as tsv_in:
-        url_list = handle_tsv_data(
-            fh=tsv_in,
+        # Only decode the lines with a PNG (so the column label row is skipped too)
+        png_lines = (line.decode("utf-8") for line in tsv_in if _PNG_MIME_FIELD in line)
+        return handle_tsv_data(
+            fh=png_lines,
             thumbnail_width=thumbnail_width,
             min_size=min_size,
             max_size=max_size,
+            has_header=False,
         )
-        return url_list
 
 
-def tsv_opener(path: Path) -> TextIO:
+def tsv_opener(path: Path) -> BinaryIO:
     """
-    Open a TSV (either text file or gzip-compressed text file).
+    Open a TSV (either text file or gzip-compressed text file) as bytes, so that only
+    the lines which are kept need to be decoded. Compressed files are decompressed
+    across all CPU cores if :mod:`rapidgzip` is installed (see
+    :func:`~wikitransp.data.open_wit_shard`).
 
     Args:
       path : The path to the TSV file.
     """
-    if path.suffix == ".gz":
-        fh = gzip.open(path, "rt")
-    else:
-        fh = open(path, "r")
-    return fh
+    return _open_binary(path)
 
 
 def handle_tsv_data(
-    fh: TextIO,
+    fh: Iterable[str],
     thumbnail_width: int,
     min_size: int,
     max_size: int,
-):
+    has_header: bool = True,
+) -> tuple[list[str], list[str], list[str]]:
     """
-    Handle an opened TSV file (regardless of compression) of the dataset.
+    Handle an opened TSV file (regardless of compression) of the dataset, returning
+    the URLs of the PNGs to check and (in parallel lists) of their thumbnails and their
+    rows (each line as read, without its line break).
 
     Args:
       fh              : A file handle opened in a suitable mode for reading text from
-                        either a plain text or gzipped text file.
+                        either a plain text or gzipped text file (or any other
+                        iterable of its lines).
       thumbnail_width : The width of the thumbnail to generate when verifying an
                         image with RGBA channels actually contains alpha transparency.
       width           : The desired output thumbnail's width (default:
@@ -295,174 +630,259 @@ def handle_tsv_data(
                         ``{_MIN_WIDTH_HEIGHT=}``px. Ignored if ``0`` or below.
       max_size        : The maximum width and height of image to filter for. Default:
                         ``{_MAX_WIDTH_HEIGHT=}``px. Ignored if ``0`` or below.
+      has_header      : Whether the first row is the TSV column label row
     """
-    tsvreader = csv.reader(fh, delimiter="\t")
-    count = 0
-    urls_to_fetch: dict[str, str] = {}  # {thumb_url: png_url}
-    max_urls_to_fetch = 0 # 0 is no limit (used for trial runs)
-    for row_i, row in enumerate(tsvreader):
-        if max_urls_to_fetch and count == max_urls_to_fetch:
+    # The WIT TSVs are unquoted, so split lines rather than parse them with `csv`
+    # (see `check_tsv_unquoted`), and only as far as the last field needed
+    n_splits = max(_TABLE_FIELDS) + 1
+    lines = iter(fh)
+    n_pngs = 0
+    # Keep the URLs in parallel lists: dedup is done with `seen` so a dict isn't needed
+    png_urls: list[str] = []
+    thumb_urls: list[str] = []
+    rows: list[str] = []
+    max_urls_to_fetch = 0  # 0 is no limit (used for trial runs)
+    # Bind everything the loop looks up to locals, which are faster to load per row
+    get_fields = itemgetter(
+        TSV_FIELDS.MIME_TYPE,
+        TSV_FIELDS.IMAGE_URL,
+        TSV_FIELDS.ORIGINAL_WIDTH,
+        TSV_FIELDS.ORIGINAL_HEIGHT,
+    )
+    seen = set(BANNED_URLS)  # Skip banned and duplicate URLs with one membership test
+    seen_add = seen.add
+    log_add, log_check_png = log.add, Log.CheckPng
+    log_pngs = LOG_FILTER is None or log_check_png in LOG_FILTER
+    make_thumb_url = make_thumbnail_url
+    if has_header:
+        header = next(lines, None)
+        assert header is None or header.startswith("language\t")  # Column label row
+    for line in lines:
+        if max_urls_to_fetch and n_pngs == max_urls_to_fetch:
             break
-        if row_i == 0:
-            assert row[0] == "language"  # TSV column label row
-            continue
-        if row[TSV_FIELDS.MIME_TYPE] != "image/png":
+        # One C-level call rather than a subscript per field (most rows are PNGs, as
+        # the chunked reader only yields those)
+        mime_type, png_url, width_str, height_str = get_fields(
+            line.split("\t", n_splits)
+        )
+        if mime_type != "image/png":
             continue
-        png_url = row[TSV_FIELDS.IMAGE_URL]
-        if png_url in urls_to_fetch.values():
+        if png_url in seen:
             # Dataset contains duplicate URLs, match them before thumb URL generation
             continue
-        if png_url in BANNED_URLS:
-            continue
-        png_width = int(row[TSV_FIELDS.ORIGINAL_WIDTH])
-        png_height = int(row[TSV_FIELDS.ORIGINAL_HEIGHT])
+        png_width = int(width_str)
+        png_height = int(height_str)
         if min_size > 0 and min(png_width, png_height) < min_size:
             continue
         if max_size > 0 and max(png_width, png_height) > max_size:
             continue
-        count += 1
-        msg = f"({count}) @ {png_url}"
-        log.add(Log.CheckPng, msg)
-        try:
-            png_is_small = png_width <= thumbnail_width
-            if png_is_small:
-                # Can happen if min_size < thumbnail_width
-                thumb_url = png_url
-            else:
-                try:
-                    thumb_url = get_png_thumbnail_url(
-                        png_url=png_url, width=thumbnail_width, guess=True
-                    )
-                except Exception as excinfo:
-                    log.error(err=excinfo)
-                    continue
-            urls_to_fetch.update({png_url: thumb_url})
-        except Exception as e:
-            log.fail(err=e)
-            log.error(Log.RoutineException, err=e)
-    url_list = list(urls_to_fetch)
-    # Go no further now: come back to what follows when all files processed
-    return url_list
-
-def deprecated_rest_of_async_fetch_func(tsvwriter, close_client: bool):
+        n_pngs += 1
+        if log_pngs:
+            log_add(log_check_png, "(%d) @ %s", n_pngs, png_url)
+        thumb_url = make_thumb_url(png_url, png_width, thumbnail_width)
+        if thumb_url is not None:
+            seen_add(png_url)
+            png_urls.append(png_url)
+            thumb_urls.append(thumb_url)
+            rows.append(line.rstrip("\r\n"))
+    return png_urls, thumb_urls, rows
+
+
+def check_tsv_unquoted(tsv_path: Path) -> None:
     """
+    Check that splitting the lines of a TSV file on tabs gives the same rows as
+    parsing it with :func:`csv.reader` (i.e. that no field is quoted, or contains a tab
+    or line break), as :func:`handle_tsv_data` and :func:`tsv_chunk_specs` assume.
+    This is slow, so is not done as part of :func:`filter_tsv_rows`: run it once on a
+    new shard to check it.
+
+    Raises:
+      ValueError if any line is parsed differently by :func:`csv.reader`.
+
     Args:
-      tsvwriter       : csv.writer object to write the TSV output file (shared across
-                        all TSV input files)
-      close_client    : Whether to close the client after use.
+      tsv_path : The TSV file path (gzip-compressed files are acceptable)
     """
-    ###########################################################################
-    log.add(Log.PrePngStreamAsyncFetcher)  # Here this is once for all the URLs
-    fetched = PngStream.make_async_fetcher(
-        urls=url_list,
-        callback=thumb_callback,
-        client=client,
-        raise_response=False,
-        close_client=close_client,
+    with open_wit_shard(tsv_path) as fh:
+        for line_i, line in enumerate(fh):
+            row = next(csv.reader([line], delimiter="\t"))
+            if row != line.rstrip("\r\n").split("\t"):
+                raise ValueError(f"Line {line_i} of {tsv_path} is not plain TSV")
+
+
+def handle_tsv_table(
+    tsv_path: Path,
+    thumbnail_width: int,
+    min_size: int,
+    max_size: int,
+) -> tuple[list[str], list[str], list[str]]:
+    """
+    Handle a TSV file (regardless of compression) of the dataset, as for
+    :func:`handle_tsv_data` but reading it with :mod:`pyarrow` (one line per row,
+    streamed so that only the lines with a PNG are kept in memory), and filtering
+    the rows with its vectorised compute functions, so only the remaining PNGs are
+    handled in Python (to make their thumbnail URLs).
+
+    Args:
+      tsv_path        : path to the TSV file (gzipped or uncompressed)
+      thumbnail_width : The width of the thumbnail to generate when verifying an
+                        image with RGBA channels actually contains alpha transparency.
+      min_size        : The minimum width and height of image to filter for. Default:
+                        ``{_MIN_WIDTH_HEIGHT=}``px. Ignored if ``0`` or below.
+      max_size        : The maximum width and height of image to filter for. Default:
+                        ``{_MAX_WIDTH_HEIGHT=}``px. Ignored if ``0`` or below.
+    """
+    # Lines containing the delimiter are parsed as more than one column: set them aside
+    # (along with the rest of the rows, they are kept as the line itself)
+    odd_lines: list[str] = []
+
+    def set_aside(row: pa_csv.InvalidRow) -> str:
+        odd_lines.append(row.text)
+        return "skip"
+
+    reader = pa_csv.open_csv(
+        tsv_path,  # Decompressed according to the file extension
+        # Parse in larger blocks than the default 1 MiB, for fewer tasks
+        read_options=pa_csv.ReadOptions(
+            block_size=_TABLE_BLOCK_SIZE, column_names=["line"]
+        ),
+        parse_options=pa_csv.ParseOptions(
+            delimiter=_LINE_DELIMITER, quote_char=False, invalid_row_handler=set_aside
+        ),
+        convert_options=pa_csv.ConvertOptions(column_types={"line": pa.string()}),
     )
-    fetch_iteration = 0
-    while fetched.completed.isempty() or min(fetched.completed).end < fetched.n:
-        iter_msg = f"{fetch_iteration}: ({fetched.total_complete} of {fetched.n})"
-        log.add(Log.FetchIteration, msg=iter_msg)
-        fetch_iteration += 1
-        try:
-            fetched.make_calls()
-        except Exception as exc:
-            # Regenerate the client to force close any connections left open?
-            # log.error(Log.UnclosedStreamException)
-            log.error(Log.RoutineException, err=exc)
-            log.fail(err=exc)
-        else:
-            log.succeed()
+    # Filter to PNGs first, so the other filters only compute over those rows
+    lines = pa.chunked_array(
+        [
+            batch["line"].filter(pc.match_substring(batch["line"], "\timage/png\t"))
+            for batch in reader
+        ],
+        type=pa.string(),
+    )
+    fields = pc.split_pattern(lines, "\t", max_splits=max(_TABLE_FIELDS) + 1)
+    mime_types = pc.list_element(fields, TSV_FIELDS.MIME_TYPE)
+    pngs = pc.equal(mime_types, "image/png")
+    lines, fields = lines.filter(pngs), fields.filter(pngs)
+    png_urls = pc.list_element(fields, TSV_FIELDS.IMAGE_URL)
+    png_widths = pc.list_element(fields, TSV_FIELDS.ORIGINAL_WIDTH).cast(pa.int32())
+    png_heights = pc.list_element(fields, TSV_FIELDS.ORIGINAL_HEIGHT).cast(pa.int32())
+    banned = pc.is_in(png_urls, value_set=pa.array(list(BANNED_URLS)))
+    mask = pc.invert(banned)
+    if min_size > 0:
+        min_dims = pc.min_element_wise(png_widths, png_heights)
+        mask = pc.and_(mask, pc.greater_equal(min_dims, min_size))
+    if max_size > 0:
+        max_dims = pc.max_element_wise(png_widths, png_heights)
+        mask = pc.and_(mask, pc.less_equal(max_dims, max_size))
+    lines, png_urls = lines.filter(mask), png_urls.filter(mask)
+    png_widths = png_widths.filter(mask)
+    # Make all thumbnail URLs in one pass, as for ``get_png_thumbnail_url``, leaving
+    # nulls for URLs that don't match the expected format (to resort to the API)
+    guessed_thumb_urls = pc.replace_substring_regex(
+        png_urls,
+        pattern=_WPC_URL_REGEX,
+        replacement=rf"{_WPC_PREFIX}thumb/\1\2/{thumbnail_width}px-\2",
+    )
+    is_wpc_url = pc.match_substring_regex(png_urls, pattern=_WPC_URL_REGEX)
+    thumb_urls = pc.if_else(
+        # The PNG is not much wider than the thumbnail (see `make_thumbnail_url`)
+        pc.less_equal(png_widths, thumbnail_width * _THUMB_BYPASS_FACTOR),
+        png_urls,
+        pc.if_else(is_wpc_url, guessed_thumb_urls, pa.scalar(None, pa.string())),
+    )
+    seen: set[str] = set()
+    kept_png_urls: list[str] = []
+    kept_thumb_urls: list[str] = []
+    kept_rows: list[str] = []
+    n_pngs = 0
+    log_pngs = LOG_FILTER is None or Log.CheckPng in LOG_FILTER
+    for png_url, png_width, thumb_url, row in zip(
+        png_urls.to_pylist(),
+        png_widths.to_pylist(),
+        thumb_urls.to_pylist(),
+        lines.to_pylist(),
+    ):
+        if png_url in seen:
+            continue  # Dataset contains duplicate URLs
+        n_pngs += 1
+        if log_pngs:
+            log.add(Log.CheckPng, "(%d) @ %s", n_pngs, png_url)
+        if thumb_url is None:
+            thumb_url = make_thumbnail_url(png_url, png_width, thumbnail_width)
+        if thumb_url is not None:
+            seen.add(png_url)
+            kept_png_urls.append(png_url)
+            kept_thumb_urls.append(thumb_url)
+            kept_rows.append(row.rstrip("\r"))
+    if odd_lines:
+        for png_url, thumb_url, row in zip(
+            *handle_tsv_data(
+                fh=(line for line in odd_lines if _PNG_MIME_FIELD.decode() in line),
+                thumbnail_width=thumbnail_width,
+                min_size=min_size,
+                max_size=max_size,
+                has_header=False,
+            )
+        ):
+            if png_url not in seen:
+                seen.add(png_url)
+                kept_png_urls.append(png_url)
+                kept_thumb_urls.append(thumb_url)
+                kept_rows.append(row)
+    return kept_png_urls, kept_thumb_urls, kept_rows
+
+
+def make_thumbnail_url(
+    png_url: str, png_width: int, thumbnail_width: int
+) -> str | None:
+    """
+    Make the thumbnail URL for a PNG (or just use its URL if the thumbnail would not be
+    much smaller). If it can't be made, log the error and return ``None``.
 
+    A PNG up to ``_THUMB_BYPASS_FACTOR`` times the thumbnail width is used as is:
+    the thumbnail would save little (and Wikimedia often serves the original anyway),
+    and its alpha check stops at the first semitransparent scanline in any case, so
+    the larger image data costs less than resolving a thumbnail (which may need an
+    API call).
 
-async def thumb_callback(fetcher, stream, url):
-    log.add(Log.PngStream, msg=url, since=Log.PrePngStreamAsyncFetcher)
-    stream_response = stream._ranges[stream.total_range].request.response
-    status_code = stream_response.status_code
+    Args:
+      png_url         : URL of the PNG
+      png_width       : The width of the PNG
+      thumbnail_width : The width of the thumbnail
+    """
+    if png_width <= thumbnail_width * _THUMB_BYPASS_FACTOR:
+        # Can happen if min_size < thumbnail_width * _THUMB_BYPASS_FACTOR
+        return png_url
     try:
-        stream_response.raise_for_status()
-    except httpx.HTTPStatusError as exc:
-        if status_code == 404:
-            # Note this is the thumbnail URL not the source URL in the dataset
-            msg = f"Add to banned URLs (status code {status_code}): {url}"
-            log.add(Log.BanURL, msg)
-            fetcher.mark_url_complete(url)
-            log.succeed()  # Recover from 404
-        else:
-            log.error(Log.URLException, msg)
-            log.fail(err=exc)  # Don't accept non-404 error codes
-    else:
-        if stream.data.IHDR.channel_count != 4:
-            # Don't want indexed so must have 4 channels
-            pass  # just close
-        # await stream.enumerate_chunks_async() # Put back in later
-        log.succeed()  # No error is a success
-    await stream.aclose()  # always close the stream
-    log.add(Log.PngDone, prefix=":-) ")
-    del stream
-    gc.collect()
-    log.add(Log.GarbageCollect, since=Log.PngDone)
-
-
-def make_png_stream(row: list[str], url: str, client) -> PngStream:
-    # log = logging.helper # global now
+        return get_png_thumbnail_url(png_url=png_url, width=thumbnail_width, guess=True)
+    except Exception as excinfo:
+        log.error(err=excinfo)
+        return None
+
+
+def collect_garbage() -> None:
+    """
+    Collect the youngest generation of garbage once every ``_GC_INTERVAL`` PNGs, rather
+    than the entire heap after every PNG (which pauses the event loop for longer the
+    more streams are in flight), and all (unfrozen) generations once every
+    ``_FULL_GC_INTERVAL`` PNGs. Automatic collection is disabled while checking PNGs,
+    so this is the only way that any garbage left in reference cycles is freed.
+    """
+    png_count = next(_png_counter)
+    if png_count % _GC_INTERVAL == 0:
+        full = png_count % _FULL_GC_INTERVAL == 0
+        gc.collect(generation=2 if full else 0)
+        log.add(Log.GarbageCollect, since=Log.PngDone if LOG_TIMINGS else None)
+
+
+def make_png_stream(url: str, client: httpx.Client) -> PngStream:
     p = PngStream(
         url=url,
         client=client,
+        # Stream the whole PNG from a single GET, reading its chunks from that one
+        # response rather than making a range request per chunk (one round trip each)
+        single_request=True,
         enumerate_chunks=False,
     )
-    log.add(Log.PngStream, since=Log.PrePngStreamAsyncFetcher)
+    if LOG_TIMINGS:
+        log.add(Log.PngStream, since=Log.PrePngStreamAsyncFetcher)
     return p
-
-
-def deprecated():
-    for x in []:
-        try:
-            p = make_png_stream(row=row, url=thumb_url, client=client)
-            if p.data.IHDR.channel_count != 4:
-                # Don't want indexed so must have 4 channels
-                p.close()
-                continue
-            # p.populate_chunks(which=["IDAT"])  # This is still the slowest step
-            p.populate_chunks()
-            log.add(Log.PopulateChunks, since=Log.PngStream)
-            direct_alpha = p.alpha_as_direct
-            log.add(Log.DirectAlpha, since=Log.PopulateChunks)
-
-            if direct_alpha:
-                if confirm_idat_alpha(stream=p):
-                    log.add(Log.ConfAlpha, since=Log.DirectAlpha)
-                    tsvwriter.writerow(row)
-                    log.add(Log.WriteRow, since=Log.ConfAlpha)
-                else:
-                    log.add(Log.ConfAlphaNeg, since=Log.DirectAlpha)
-            else:
-                log.add(Log.DirectAlphaNeg, since=Log.DirectAlpha)
-            p.close()
-        except Exception as e:
-            log.fail(err=e)
-            try:
-                p.close()
-            except Exception:
-                pass
-            log.error(Log.RoutineException, err=e)
-            msg = f"Possibly add to banned URLs: {png_url}"
-            log.error(Log.BanURLException, msg)
-            continue
-        # Reference for the GC timer
-        log.add(Log.PngDone, prefix=":-) ")
-        del p
-        gc.collect()
-        log.add(Log.GarbageCollect, since=Log.PngDone)
-        td = log.get_duration_between_prior_events(
-            which0=Log.CheckPng, which1=Log.GarbageCollect
-        )
-        assert td is not None  # give mypy a clue
-        mean_td = log.get_mean_duration(which=Log.AverageTime, extra=[td])
-        log.add(
-            Log.AverageTime,
-            since=Log.CheckPng,
-            prefix=f"{mean_td:.4f} ---> ",
-        )
-        log.succeed()
@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Literal, overload
+
+MYPY = False  # when using mypy will be overrided as True
+if MYPY or not TYPE_CHECKING:  # pragma: no cover
+    import httpx  # avoid importing to Sphinx type checker
+
+__all__ = ["make_client"]
+
+_MAX_CONNECTIONS = 32  # Per client: HTTP/2 multiplexes many requests over each
+_KEEPALIVE_EXPIRY_S = 60.0
+_TIMEOUT_S = 10.0  # For each read (or write) of a request, rather than it overall
+_CONNECT_TIMEOUT_S = 3.0
+_CONNECT_RETRIES = 2
+# Wikimedia's User-Agent policy asks clients to identify themselves (and may throttle
+# or block generic library user agents such as httpx's default)
+_USER_AGENT = "wikitransp (https://github.com/lmmx/wikitransp)"
+
+
+@overload
+def make_client(
+    fetch_async: Literal[True],
+    timeout_s: float | None = ...,
+    max_connections: int = ...,
+) -> httpx.AsyncClient: ...
+
+
+@overload
+def make_client(
+    fetch_async: Literal[False],
+    timeout_s: float | None = ...,
+    max_connections: int = ...,
+) -> httpx.Client: ...
+
+
+def make_client(
+    fetch_async: bool,
+    timeout_s: float | None = _TIMEOUT_S,
+    max_connections: int = _MAX_CONNECTIONS,
+) -> httpx.AsyncClient | httpx.Client:
+    """
+    Make a client that uses HTTP/2, so that concurrent requests to the same host
+    (i.e. the Wikipedia upload server) are multiplexed over a few connections rather
+    than each paying for its own TCP+TLS handshake, and which keeps its connections
+    alive between requests. Failed connection attempts are retried. Requests are sent
+    with a descriptive User-Agent header. Every client the package sends requests
+    with is made here, so that they all send it.
+
+    Args:
+      fetch_async     : Whether to make an async client (else a synchronous one).
+      timeout_s       : The timeout (in seconds) for each read or write of a request,
+                        or ``None`` for no limit (e.g. for large downloads). Connecting
+                        always times out after ``{_CONNECT_TIMEOUT_S=}`` seconds.
+      max_connections : The number of connections to keep in the pool
+    """
+    # Limits must be passed to the transport, as it overrides those of the client
+    limits = httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_connections,
+        keepalive_expiry=_KEEPALIVE_EXPIRY_S,
+    )
+    timeout = httpx.Timeout(timeout_s, connect=_CONNECT_TIMEOUT_S)
+    headers = {"User-Agent": _USER_AGENT}
+    if fetch_async:
+        transport = httpx.AsyncHTTPTransport(
+            http2=True, limits=limits, retries=_CONNECT_RETRIES
+        )
+        return httpx.AsyncClient(transport=transport, timeout=timeout, headers=headers)
+    sync_transport = httpx.HTTPTransport(
+        http2=True, limits=limits, retries=_CONNECT_RETRIES
+    )
+    return httpx.Client(transport=sync_transport, timeout=timeout, headers=headers)
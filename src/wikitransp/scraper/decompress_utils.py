@@ -1,11 +1,15 @@
 from __future__ import annotations
 
-import gzip
+import os
 import shutil
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 from tqdm import tqdm
 
+from ..data import shards
+from ..data.shards import _READ_BUFFER_SIZE, _open_binary
+
 __all__ = ["decompress_gz_file"]
 
 
@@ -13,7 +17,8 @@ def decompress_gz_file(gz_path: Path) -> Path:
     """
     Decompress a gzip-compressed file to disk, naming it by just removing the ".gz"
     suffix. If the output path already exists, assume it was already decompressed,
-    and do not touch it.
+    and do not touch it. The file is decompressed to a temporary ".part" file first,
+    so that an interrupted decompression is not mistaken for a complete one.
 
     Args:
       gz_path : The path to the gzip-compressed file
@@ -22,22 +27,30 @@ def decompress_gz_file(gz_path: Path) -> Path:
         raise ValueError(f"Expected file suffix to be '.gz', got '{gz_path.suffix}'")
     out_path = gz_path.parent / gz_path.stem
     if not out_path.exists():
-        with gzip.open(gz_path, "r") as f_in, open(out_path, "wb") as f_out:
-            shutil.copyfileobj(f_in, f_out)
+        part_path = out_path.parent / f"{out_path.name}.part"
+        # Decompress with rapidgzip or ISA-L if installed (see `open_wit_shard`)
+        with _open_binary(gz_path) as f_in, open(
+            part_path, "wb", buffering=_READ_BUFFER_SIZE
+        ) as f_out:
+            shutil.copyfileobj(f_in, f_out, _READ_BUFFER_SIZE)
+        part_path.replace(out_path)
     return out_path
 
 
 def decompress_gz_files(paths: list[Path]) -> list[Path]:
     """
     Decompress a list of gzip-compressed files to disk, returning their decompressed
-    file paths.
+    file paths. Files are decompressed in parallel on all CPU cores, unless each is
+    already decompressed across all cores (i.e. when :mod:`rapidgzip` is installed).
 
     Args:
       paths: List of paths to the gzip-compressed files.
     """
-    decompressed_files = []
     n_tsv = f"{(n := len(paths))} gzipped file{'s' if n > 1 else ''}"
-    for gz_path in tqdm(paths, desc=f"Decompressing {n_tsv}"):
-        out_path = decompress_gz_file(gz_path=gz_path)
-        decompressed_files.append(out_path)
+    n_workers = 1 if shards.rapidgzip is not None else min(n, os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=max(n_workers, 1)) as executor:
+        out_paths = executor.map(decompress_gz_file, paths)
+        decompressed_files = list(
+            tqdm(out_paths, total=n, desc=f"Decompressing {n_tsv}")
+        )
     return decompressed_files
@@ -1,24 +1,48 @@
 from __future__ import annotations
 
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from sys import stderr
+from typing import Any, Coroutine, Iterable, TypeVar
 
-from range_streams import RangeStream
+import httpx
 from tqdm import tqdm
 
 from ..data import DATA_DIR_URL, FULL_DATA_URLS, SAMPLE_DATA_URL
 from ..data.store import _dir_path as store_path
+from .async_utils import async_fetch_shards
+from .clients import make_client
 
-__all__ = ["download_dataset", "download_data_url"]
+__all__ = [
+    "download_dataset",
+    "download_data_url",
+    "adownload_data_urls",
+    "adownload_data_url",
+]
 
+_DOWNLOAD_CHUNK_SIZE = 1 << 20  # 1 MiB
+_DOWNLOAD_LIMIT = 4  # Number of files to download at once (to be polite to the CDN)
 
-def download_dataset(sample: bool = False) -> list[Path]:
-    data_urls = [SAMPLE_DATA_URL] if sample else FULL_DATA_URLS
-    data_files = []
-    for data_url in data_urls:
-        data_file_path = download_data_url(data_url)
-        data_files.append(data_file_path)
-    return data_files
+_T = TypeVar("_T")
+
+
+def download_dataset(sample: bool = False, limit: int = _DOWNLOAD_LIMIT) -> list[Path]:
+    """
+    Download (or finish downloading) the data files of the WIT dataset, up to
+    ``limit`` at a time, and return the :class:`~pathlib.Path` to each on disk.
+
+    This blocks until the downloads finish, even when called from within a running
+    event loop (see :func:`_run_to_completion`): from a coroutine, await
+    :func:`adownload_data_urls` instead.
+
+    Args:
+      sample : Whether to download only the sample data file (else the full dataset)
+      limit  : The maximum number of files to download concurrently
+    """
+    data_urls = (SAMPLE_DATA_URL,) if sample else FULL_DATA_URLS
+    return _run_to_completion(adownload_data_urls(data_urls, limit=limit))
 
 
 def download_data_url(data_url: str) -> Path:
@@ -26,40 +50,142 @@ def download_data_url(data_url: str) -> Path:
     Download (or finish downloading) the data file at ``data_url``, and return
     the :class:`~pathlib.Path` to it on disk.
 
+    This blocks until the download finishes, even when called from within a running
+    event loop (see :func:`_run_to_completion`): from a coroutine, await
+    :func:`adownload_data_urls` instead.
+
     Args:
       data_url : The URL of the data file (a gzipped TSV) from the WIT dataset.
     """
+    return _run_to_completion(adownload_data_urls([data_url]))[0]
+
+
+def _run_to_completion(coro: Coroutine[Any, Any, _T]) -> _T:
+    """
+    Run a coroutine from synchronous code with :func:`asyncio.run`, unless there is
+    already an event loop running in this thread (where :func:`asyncio.run` raises
+    :class:`RuntimeError`), in which case run it on a new loop in a worker thread.
+    Either way, block until it completes and return its result.
+
+    Args:
+      coro : The coroutine to run
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coro).result()
+
+
+async def adownload_data_urls(
+    data_urls: Iterable[str], limit: int = _DOWNLOAD_LIMIT
+) -> list[Path]:
+    """
+    Download (or finish downloading) the data files at ``data_urls``, up to ``limit``
+    at a time (each file over its own stream, so a throttled stream only slows its
+    own file), and return the :class:`~pathlib.Path` to each on disk (in order).
+
+    Args:
+      data_urls : The URLs of the data files (gzipped TSVs) from the WIT dataset.
+      limit     : The maximum number of files to download concurrently
+    """
+    sem = asyncio.Semaphore(limit)
+    # Reads of the (multi-GB) files are not timed out, as before
+    async with make_client(fetch_async=True, timeout_s=None) as client:
+
+        async def download(data_url: str, position: int) -> Path:
+            async with sem:
+                return await adownload_data_url(data_url, client, position=position)
+
+        downloads = (download(url, pos) for pos, url in enumerate(data_urls))
+        return list(await asyncio.gather(*downloads))
+
+
+async def adownload_data_url(
+    data_url: str, client: httpx.AsyncClient, position: int | None = None
+) -> Path:
+    """
+    Download (or finish downloading) the data file at ``data_url``, and return
+    the :class:`~pathlib.Path` to it on disk.
+
+    A new file is downloaded as several concurrent range requests (see
+    :func:`~wikitransp.scraper.async_utils.async_fetch_shards`), as a single stream
+    is limited by the throughput of one TCP connection. If the server doesn't honour
+    the ranges, it is downloaded over one stream instead, as is the rest of a file
+    already partly downloaded over one stream.
+
+    Args:
+      data_url : The URL of the data file (a gzipped TSV) from the WIT dataset.
+      client   : The client to send the requests with
+      position : The line to show the progress bar on (when downloading several
+                 files at once)
+    """
     filename = data_url[len(DATA_DIR_URL) :]
     store_file = store_path / filename
-    s = RangeStream(data_url)
-    s.add(s.total_range)
-    start_at = 0
-    if store_file.exists():
-        file_len = store_file.stat().st_size
-        assert s.total_bytes is not None  # give mypy a clue
-        if file_len < s.total_bytes:
-            # Download rest of file
-            remaining_range = (file_len, s.total_bytes)
-            print(f"Incomplete {filename}, downloading {remaining_range=}", file=stderr)
-            s.add(remaining_range)  # This re-assigns the active range response
-            start_at += file_len
-        elif file_len > s.total_bytes:
+    # Resume from the end of any existing file, in a single request: the total size
+    # is then given by the response, so there's no need to request it beforehand
+    start_at = store_file.stat().st_size if store_file.exists() else 0
+    if not start_at:
+        try:
+            [path] = await async_fetch_shards([data_url], store_path, session=client)
+        except ValueError as exc:
+            print(f"Ranges of {filename} not served ({exc}), streaming it", file=stderr)
+        else:
+            return path
+    headers = {"Range": f"bytes={start_at}-"} if start_at else {}
+    async with client.stream("GET", data_url, headers=headers) as response:
+        if response.status_code == httpx.codes.REQUESTED_RANGE_NOT_SATISFIABLE:
+            # The existing file is at least as long as the data file
+            if _content_range_total(response) == start_at:
+                # An existing file with the correct size doesn't need re-downloading
+                return store_file
             # Delete the file and re-download entirely
             print(f"Bad {filename} found, re-downloading", file=stderr)
             store_file.unlink()
+            return await adownload_data_url(data_url, client, position=position)
+        response.raise_for_status()
+        if response.status_code == httpx.codes.PARTIAL_CONTENT:
+            total_bytes: int | None = _content_range_total(response)
+            # Download rest of file
+            remaining_range = (start_at, total_bytes)
+            print(f"Incomplete {filename}, downloading {remaining_range=}", file=stderr)
         else:
-            # An existing file with the correct size doesn't need re-downloading
-            return store_file
-    response = s.active_range_response.request.response
-    print(f"Storing {store_file}")
-    with open(store_file, "ab") as f:
-        with tqdm(
-            total=s.total_bytes, unit_scale=True, unit_divisor=1024, unit="B"
-        ) as progress:
-            progress.update(start_at)
-            num_bytes_downloaded = response.num_bytes_downloaded
-            for chunk in response.iter_bytes():
-                f.write(chunk)
-                progress.update(response.num_bytes_downloaded - num_bytes_downloaded)
+            content_length = response.headers.get("Content-Length")
+            total_bytes = None if content_length is None else int(content_length)
+            if start_at:
+                start_at = 0  # The server ignored the range, so sent the entire file
+                store_file.unlink()
+        print(f"Storing {store_file}")
+        with open(store_file, "ab") as f:
+            with tqdm(
+                total=total_bytes,
+                unit_scale=True,
+                unit_divisor=1024,
+                unit="B",
+                desc=filename,
+                position=position,
+            ) as progress:
+                progress.update(start_at)
                 num_bytes_downloaded = response.num_bytes_downloaded
+                async for chunk in response.aiter_bytes(_DOWNLOAD_CHUNK_SIZE):
+                    f.write(chunk)
+                    downloaded = response.num_bytes_downloaded - num_bytes_downloaded
+                    progress.update(downloaded)
+                    num_bytes_downloaded = response.num_bytes_downloaded
+            if hasattr(os, "posix_fadvise"):
+                # The shard is read later (if at all), so don't evict other files for it
+                f.flush()
+                os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
     return store_file
+
+
+def _content_range_total(response: httpx.Response) -> int:
+    """
+    Get the total size of the file from the ``Content-Range`` header of a response
+    to a range request (of the form ``bytes 0-99/1234`` or ``bytes */1234``).
+
+    Args:
+      response : The response to the range request
+    """
+    return int(response.headers["Content-Range"].rpartition("/")[2])
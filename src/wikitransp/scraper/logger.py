@@ -1,21 +1,31 @@
 from __future__ import annotations
 
+import atexit
 import logging
+import mmap
+import multiprocessing as mp
+import threading
 import time
-from enum import Enum
+from array import array
+from collections import defaultdict
+from enum import IntEnum
 from io import SEEK_END, StringIO
-from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from pathlib import Path
 from sys import stderr, stdout
-from typing import Literal, Type, overload
-
-from humanfriendly import format_timespan
+from typing import ClassVar, Literal, Type, overload
 
 from ..logs import logs_dir
-from .buf_grep import grep_backwards
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None  # type: ignore[assignment]  # Fall back to a single pass in Python
 
 __all__ = ["Logger", "Log", "Event"]
 
+_LOG_FLUSH_INTERVAL_S = 1.0  # Longest time a written record may sit in the file buffer
+
 
 class MaxLogFailureError(ValueError):
     def __init__(self, log: Logger):
@@ -23,10 +33,121 @@ class MaxLogFailureError(ValueError):
         super().__init__(message)
 
 
-class Log(Enum):
+def _ns_to_s(ns: int) -> float:
+    """
+    Convert a duration in nanoseconds (e.g. between event times) to seconds.
+    """
+    return ns / 1e9
+
+
+def _fmt_timespan(seconds: float) -> str:
+    """
+    Format a duration in seconds as e.g. '5.12s', '2m 5s', or '1h 2m 5s', without the
+    import and pluralisation of :func:`humanfriendly.format_timespan` (which is only
+    used for durations of over a day).
+    """
+    if seconds >= 86400:
+        from humanfriendly import format_timespan
+
+        return format_timespan(seconds)
+    h, rem = divmod(int(seconds), 3600)
+    m, sec = divmod(rem, 60)
+    if h:
+        return f"{h}h {m}m {sec}s"
+    elif m:
+        return f"{m}m {sec}s"
+    return f"{seconds:.2f}s"
+
+
+def _duration_stats(durations: array[float]) -> tuple[float, float, float]:
+    """
+    The mean, minimum and maximum of a (non-empty) array of durations, computed over
+    the array's buffer with numpy if installed, else in a single pass (rather than one
+    pass each for ``sum``, ``min`` and ``max``).
+    """
+    if np is not None:
+        arr = np.frombuffer(durations, dtype=np.float64)  # Zero-copy view
+        return float(arr.mean()), float(arr.min()), float(arr.max())
+    total = 0.0
+    lo = hi = durations[0]
+    for d in durations:
+        total += d
+        if d < lo:
+            lo = d
+        elif d > hi:
+            hi = d
+    return total / len(durations), lo, hi
+
+
+def _stop_listener(listener: QueueListener) -> None:
+    """
+    Stop a listener thread once it has handled every record on its queue, and close
+    its handlers (flushing the log file). Does nothing if it was already stopped.
+    """
+    if listener._thread is not None:  # Stopping twice would fail
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+
+
+def _stop_active_listener() -> None:
+    """
+    Write out any records still queued when the interpreter exits, if the active
+    Logger wasn't stopped (e.g. the program raised an exception), as the listener
+    thread is a daemon and would otherwise be killed with them still on its queue.
+    """
+    if Logger._active_listener is not None:
+        _stop_listener(Logger._active_listener)
+
+
+atexit.register(_stop_active_listener)  # Runs before logging's own exit handler
+
+
+class _BatchedFileHandler(logging.FileHandler):
+    """
+    A file handler which flushes its stream at most once every
+    ``_LOG_FLUSH_INTERVAL_S`` seconds (and when closed), rather than after every
+    record, so that bursts of records are written in buffer-sized blocks with one
+    syscall each rather than one per record. Records left in the buffer when the
+    handler goes idle are flushed by a timer once the interval is up.
+    """
+
+    last_flush = 0.0
+    _flush_timer: threading.Timer | None = None
+
+    def flush(self) -> None:
+        now = time.monotonic()
+        if now - self.last_flush >= _LOG_FLUSH_INTERVAL_S:
+            super().flush()
+            self.last_flush = now
+        elif self._flush_timer is None:
+            # No later record may come to flush this one, so flush it on a timer
+            delay = self.last_flush + _LOG_FLUSH_INTERVAL_S - now
+            self._flush_timer = threading.Timer(delay, self._flush_pending)
+            self._flush_timer.daemon = True
+            self._flush_timer.start()
+
+    def _flush_pending(self) -> None:
+        self.acquire()  # Records are emitted (and so flushed) with the lock held
+        try:
+            self._flush_timer = None
+            self.last_flush = 0.0  # Force the flush
+            self.flush()
+        finally:
+            self.release()
+
+    def close(self) -> None:
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+        self.last_flush = 0.0  # Force the final flush
+        super().close()
+
+
+class Log(IntEnum):
     """
     The different types of logged event, in order of execution (with any non-specific
-    event types, which don't need to be ordered relative to the rest, afterwards).
+    event types, which don't need to be ordered relative to the rest, afterwards). An
+    :class:`~enum.IntEnum`, so the order can be compared directly (and cheaply).
     """
 
     Init = 0
@@ -67,6 +188,7 @@ class Logger:
     """
 
     DEFAULT_FILE_NAME: str = "wikitransp.log"
+    _active_listener: ClassVar[QueueListener | None] = None  # Of the latest Logger
 
     def __init__(
         self,
@@ -107,15 +229,23 @@ class Logger:
           fail_limit    : Consecutive failure count before raising MaxLogFailureError
         """
         self.name = name
+        self._py_logger = logging.getLogger(name)  # Resolved once, not per record
         self.log_level = log_level
         self.console_level = console_level
-        self.logs: dict[str, list[Event]] = {}
+        # Only ever indexed to append, so only event types logged are ever keys
+        self.logs: defaultdict[Log, list[Event]] = defaultdict(list)
+        # The durations of the timed events of each type, as a C array of doubles
+        self.durations: dict[Log, array[float]] = {}
+        # The most recent event of each type, for timing against without list lookups
+        self._last_event: dict[Log, Event] = {}
         self.LINE_ENDING = line_ending
         self.simple = simple
         self.path = path
         self.n_logs = n_logs
         self.fail_limit = fail_limit
         self.auto_resume = auto_resume
+        self._resume_point: str | None = None
+        self._resume_thread: threading.Thread | None = None
         self.consecutive_failures = 0
         self.prepare_logging(console_headers=term_headers)
         self.filter = [] if which is None else which
@@ -128,41 +258,37 @@ class Logger:
         """
         return logs_dir / self.DEFAULT_FILE_NAME if self.path is None else self.path
 
-    def grep_backwards(
-        in_file: Path,
-        match_substr: str,
-        chunk_size=10,
-        max_count: int = 0,
-    ) -> list[str]:
+    def detect_resume_point(self, log_path: Path) -> str | None:
         """
-        Helper for scanning a file line by line from the end (when inspecting log
-        messages that come at the end of the logs).
+        Find the last resume point suggested in the log at ``log_path`` (if any). The
+        file is memory-mapped and searched from the end for the marker with
+        :meth:`mmap.mmap.rfind`, rather than read line by line.
 
         Args:
-          in_file      : Path of the file to grep backwards in (will be opened and
-                         closed within the method call)
-          match_substr : Substring to match on a line. Regular expression not supported
-          chunk_size   : How many characters to load into the buffer per read chunk.
-                         Should be roughly around or above file's characters per line
-          max_count    : How many matching lines to extract.
-        """
-        with open(in_log_file, "r") as f:
-            match_it = grep_backwards(f, match_substr=match_substr, step=chunk_size)
-            matched_lines = []
-            if max_count > 0:
-                for i in range(max_count):
-                    try:
-                        matched_lines.append(next(match_it))
-                    except StopIteration:
-                        break
-            else:
-                # No maximum, i.e. return any and all matches, i.e. exhaust iterator
-                matched_lines.extend(list(match_it))
-        return matched_lines
+          log_path : The path to the log file to search
+        """
+        marker = f"{Log.ResumePoint.name} ⠶ ".encode()
+        if not log_path.exists() or log_path.stat().st_size == 0:
+            return None  # An empty file can't be mapped
+        with open(log_path, "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                start = mm.rfind(marker)
+                if start == -1:
+                    return None
+                end = mm.find(b"\n", start)
+                return mm[start : (len(mm) if end == -1 else end)].decode("utf-8")
 
-    def detect_resume_point(self, log_path: Path) -> None:
-        # Grep from the end of the file backwards
-        self.grep_backwards(in_log_file=log_path, match_substr="ResumePoint ⠶ ")
+    def _set_resume_point(self, log_path: Path) -> None:
+        self._resume_point = self.detect_resume_point(log_path)
+
+    def get_resume_point(self) -> str | None:
+        """
+        Get the last resume point suggested in the previous log (if ``auto_resume``),
+        waiting for the search for it (started when the Logger was created) to finish.
+        """
+        if self._resume_thread is not None:
+            self._resume_thread.join()
+        return self._resume_point
 
     def prepare_logging(
         self,
@@ -171,12 +297,13 @@ class Logger:
         date_format="%m-%d %H:%M",
     ):
         """
-        Prepare the custom logger. Note: if :meth:`logging.basicConfig` has been called
-        already, it'll override the call within this method.
+        Prepare the custom logger. The root logger's handlers are replaced by a single
+        :class:`~logging.handlers.QueueHandler`, so logging an event only puts its
+        record on a queue, and the file and console handlers are run by a
+        :class:`~logging.handlers.QueueListener` thread (stopped by
+        :meth:`stop_logging`), keeping the file writes off the caller's thread.
         """
         log_pre_exists = self.log_file.exists()
-        if self.auto_resume:
-            self.detect_resume_point(self.log_file)
 
         # Do log rotation (handler not added to logger, just used to rollover if needed)
         rot_handler = RotatingFileHandler(
@@ -186,15 +313,24 @@ class Logger:
         )
         if log_pre_exists:
             rot_handler.doRollover()
+        rot_handler.close()  # Don't leak its file handle
+        if log_pre_exists:
+            if self.auto_resume:
+                if self.n_logs > 0:
+                    # Search the previous log (now its first backup) in the background
+                    self._resume_thread = threading.Thread(
+                        target=self._set_resume_point,
+                        args=(Path(f"{self.log_file}.1"),),
+                        daemon=True,
+                    )
+                    self._resume_thread.start()
+                else:
+                    # No backup is kept, so search it before it's overwritten
+                    self._set_resume_point(self.log_file)
 
         # Set up logging to file
-        logging.basicConfig(
-            level=logging.DEBUG,  # Lowest named level: log all levels to file
-            format=log_format,
-            datefmt=date_format,
-            filename=self.log_file,
-            filemode="w",
-        )
+        file_handler = _BatchedFileHandler(filename=self.log_file, mode="w")
+        file_handler.setFormatter(logging.Formatter(log_format, datefmt=date_format))
 
         # define a Handler which writes INFO messages or higher to the sys.stderr
         console = logging.StreamHandler()
@@ -205,11 +341,28 @@ class Logger:
         formatter = logging.Formatter(console_format)
         # tell the handler to use this format
         console.setFormatter(formatter)
-        # add the handler to the root logger
-        logging.getLogger().addHandler(console)
+        # A multiprocessing queue (not a `queue.SimpleQueue`) so that the records
+        # logged by forked worker processes also reach the listener in this one
+        log_queue: mp.Queue[logging.LogRecord] = mp.Queue()
+        self.listener = QueueListener(
+            log_queue, file_handler, console, respect_handler_level=True
+        )
+        root_logger = logging.getLogger()
+        root_logger.setLevel(logging.DEBUG)  # Lowest named level: log all levels
+        # Replace (not add to) the handlers, so a new Logger doesn't duplicate records
+        root_logger.handlers = [QueueHandler(log_queue)]
+        if Logger._active_listener is not None:
+            # Nothing more will reach the previous Logger's listener: close its file
+            _stop_listener(Logger._active_listener)
+        Logger._active_listener = self.listener
+        self.listener.start()
 
-        # Now, we can log to the root logger, or any other logger. First the root...
-        # logging.getLogger(__name__).debug("Is this thing on?")
+    def stop_logging(self) -> None:
+        """
+        Stop the listener thread once it has handled every record logged so far, and
+        close its handlers (flushing the log file).
+        """
+        _stop_listener(self.listener)
 
     @property
     def time_since_init(self) -> str:
@@ -219,9 +372,8 @@ class Logger:
         log_init_event_t = Log.Init
         if self.has_event(which=log_init_event_t):
             init_event = self.get_prior_event(which=log_init_event_t)
-            init_time = init_event.when
-            elapsed_seconds = time.time() - init_time
-            elapsed_time = format_timespan(elapsed_seconds)
+            elapsed_seconds = _ns_to_s(time.monotonic_ns() - init_event.when)
+            elapsed_time = _fmt_timespan(elapsed_seconds)
         else:
             elapsed_time = "N/A"
         return elapsed_time
@@ -239,19 +391,16 @@ class Logger:
             )
             raise TypeError(err_msg)
         self._logged_types = which
+        # Precompute the checks made on every event (see `is_in_filters`)
+        self._log_all = not which  # An empty list (or None) means log all event types
+        self._filter_set = frozenset(which or ())
 
     def is_in_filters(self, which: Log) -> bool:
         """
         Determine whether a type of logged event is in the
         :attr:`~wikitransp.scraper.logger.Logger.filter` list.
         """
-        if self.filter is None:
-            is_in = True
-        else:
-            is_in = (self.filter == [] or which in self.filter) and (
-                isinstance(which, Log)  # Ensure it's in the Enum
-            )
-        return is_in
+        return self._log_all or which in self._filter_set
 
     def write_message(
         self,
@@ -265,13 +414,21 @@ class Logger:
         in a message 'spilling over' into an unprefixed and therefore making its
         provenance ambiguous if filtered: seems to be standard/best practice).
         """
-        is_error = level == logging.ERROR
+        py_logger = self._py_logger
+        if not py_logger.isEnabledFor(level):
+            return  # Checked once per message rather than per line
+        # Make the records directly, skipping the caller lookup of `Logger.log`
+        name, make_record = py_logger.name, py_logger.makeRecord
+        if line_ending == "\n" and "\n" not in msg:
+            # The usual case: a single line with the default line ending
+            py_logger.handle(make_record(name, level, "", 0, msg, (), None))
+            return
         log_msg = msg + line_ending  # N.B. ``msg`` may be multiline
         # Slice off a single newline if present at the end, so as to preserve
         # non-EOL newlines when splitting multi-line strings (but logged separately)
         log_lines = log_msg[: (-1 if log_msg.endswith("\n") else None)].split("\n")
         for log_line in log_lines:
-            logging.getLogger(self.name).log(level=level, msg=log_line)
+            py_logger.handle(make_record(name, level, "", 0, log_line, (), None))
 
     def write_event(
         self,
@@ -282,8 +439,11 @@ class Logger:
         suffix: str = "\n",
     ) -> None:
         """
-        Log the event's message to the appropriate handler(s).
+        Log the event's message to the appropriate handler(s), unless none would log it
+        at ``level`` (in which case the event isn't formatted at all).
         """
+        if not self._py_logger.isEnabledFor(level):
+            return
         msg = event.msg if only_msg else prefix + repr(event)
         self.write_message(
             msg=msg,
@@ -329,6 +489,7 @@ class Logger:
         self.early_halt()
         self.suggest_resume()
         self.summarise()
+        self.stop_logging()
 
     def successful_completion(self):
         """
@@ -346,6 +507,7 @@ class Logger:
         """
         self.successful_completion()
         self.summarise()
+        self.stop_logging()
 
     def summarise(self):
         """
@@ -354,49 +516,48 @@ class Logger:
         prefix = "    "
         line = "-" * 58
         nice_line = f"{prefix}{line}\n"
-        summary = f"{self.logs!r}"
         msg = f"Thank you for scraping with Wikitransp :^)-|-<\n"
         msg += nice_line
-        max_k_len = max(len(k) for k in self.logs)
-        log_summaries = {
-            k.ljust(max_k_len): self.summarise_log_records(which_name=k)
-            for k in self.logs
-        }
-        fmt_summaries = "\n".join([f"{k} : {v}" for k, v in log_summaries.items()])
-        nice_logs = f"\n{prefix}".join(fmt_summaries.split("\n"))
-        msg += prefix + nice_logs
+        max_k_len = max(len(k.name) for k in self.logs)
+        max_count_chars = len(str(max(map(len, self.logs.values()))))
+        log_summaries = [
+            f"{k.name.ljust(max_k_len)} : "
+            + self.summarise_log_records(
+                entries=entries,
+                durations=self.durations.get(k, array("d")),
+                max_count_chars=max_count_chars,
+            )
+            for k, entries in self.logs.items()
+        ]
+        msg += prefix + f"\n{prefix}".join(log_summaries)
         msg += "\n" + nice_line
         self.add(Log.BonVoyage, msg=msg, prefix="\n    ", level=logging.CRITICAL)
 
-    def summarise_log_records(self, which_name: str) -> str:
-        which = Log[which_name]  # enum from member name
-        summary = {}
-        max_count = max(len(self.logs[k]) for k in self.logs)
-        max_count_chars = len(str(max_count))
-        if self.has_event(which=which):
-            entries = self.logs[which_name]
-            n_records = len(entries)
-            summary.update({"n": str(n_records).ljust(max_count_chars)})
-            durations = [e.duration for e in entries if e.duration is not None]
-            assert None not in durations  # give mypy a clue
-            if durations:
-                total_durations = sum(durations)
-                assert total_durations is not None  # give mypy a clue
-                mean_duration = total_durations / len(durations)
-                summary.update({"μ": f"{mean_duration:.4f}"})
-                summary.update({"min": f"{min(durations):.4f}"})
-                summary.update({"max": f"{max(durations):.4f}"})
-        else:
-            n_records = 0
-            summary.update({"records": str(n_records)})
-        summary_str = ", ".join(f"{k}={v}" for k, v in summary.items())
-        return summary_str
+    def summarise_log_records(
+        self, entries: list[Event], durations: array[float], max_count_chars: int
+    ) -> str:
+        """
+        Summarise the logged events of one type: their count and, if timed, the mean,
+        minimum and maximum of their durations.
+
+        Args:
+          entries         : The logged events of the type
+          durations       : The durations of those events which were timed
+          max_count_chars : The width to pad the count to (that of the longest count)
+        """
+        if not entries:
+            return "records=0"
+        summary = f"n={str(len(entries)).ljust(max_count_chars)}"
+        if durations:
+            mean_duration, lo, hi = _duration_stats(durations)
+            summary += f", μ={mean_duration:.4f}, min={lo:.4f}, max={hi:.4f}"
+        return summary
 
     def add(
         self,
         what: Log,
         msg: str = "",
-        *,
+        *args,
         since: Log | None = None,
         prefix: str = "    ",
         suffix: str | None = None,
@@ -407,9 +568,14 @@ class Logger:
         and any provided message (``msg``). Optionally, also give another event type
         to calculate the elapsed time since (``since``).
 
+        If any ``args`` are given, the message is formatted with them (``msg % args``)
+        only if the event passes the Logger's filter, so that events filtered out in
+        hot loops don't pay for building their message.
+
         Args:
           what            : The type of the event
           msg             : Any message passed with the event/constructed in the logger
+          args            : (Optional) Arguments to %-format the message with (lazily)
           since           : (Optional) The type of event prior to this one, to calculate
                             relative time from (appending the difference to the ``msg``)
           prefix          : (Optional) Line prefix, to highlight a particular log record
@@ -419,13 +585,15 @@ class Logger:
         if level is None:
             level = self.log_level
         if self.is_in_filters(which=what):
-            when = time.time()
+            when = time.monotonic_ns()
+            if args:
+                msg = msg % args
             if since is None:
                 prev_event = None
             else:
                 # `since` is a `Log` enum whose integer value is less than the `what`
                 # indicating a time to calculate relative to
-                if since.value > what.value:
+                if since > what:
                     err_msg = f"Mis-specified timer: {since.value=} > {what.value=}"
                     self.error(msg=err_msg)
                     return  # Warn without raising, effectively
@@ -433,11 +601,14 @@ class Logger:
             event = Event(
                 which=what, when=when, msg=msg, prev=prev_event, simple_repr=self.simple
             )
-            empty_list: list[Event] = []
-            self.logs.setdefault(what.name, empty_list)
-            log_list = self.logs.get(what.name)
-            assert isinstance(log_list, list)  # give mypy a clue
-            log_list.append(event)
+            self.logs[what].append(event)
+            self._last_event[what] = event
+            if prev_event is not None:
+                assert event.duration is not None  # give mypy a clue
+                duration_arr = self.durations.get(what)
+                if duration_arr is None:
+                    duration_arr = self.durations[what] = array("d")
+                duration_arr.append(event.duration)
             if suffix is None:
                 suffix = self.LINE_ENDING
             self.write_event(level=level, event=event, prefix=prefix, suffix=suffix)
@@ -451,7 +622,7 @@ class Logger:
         Args:
           which : The Log enum record type (i.e. the type of the event).
         """
-        return which.name in self.logs
+        return which in self.logs
 
     def get_prior_event(self, which: Log) -> Event:
         """
@@ -461,8 +632,11 @@ class Logger:
         Args:
           which : The Log enum record type (i.e. the type of the event).
         """
-        log_list = self.get_logs(which=which)
-        return log_list[-1]
+        try:
+            return self._last_event[which]
+        except KeyError:
+            self.get_logs(which=which)  # Logs the error
+            raise AssertionError(f"No {which.name} event has been logged") from None
 
     def get_duration_between_prior_events(
         self, which0: Log, which1: Log, internal: bool = False
@@ -498,7 +672,7 @@ class Logger:
             else:
                 raise ValueError(err_msg)
         else:
-            td = t1 - t0
+            td = _ns_to_s(t1 - t0)
             return td
 
     @overload
@@ -535,10 +709,8 @@ class Logger:
         """
         if extra is None:
             extra = []
-        if self.has_event(which=which):
-            durations = self.get_durations(which=which)
-        else:
-            durations = []
+        # Average the stored array directly, rather than a list copy of it
+        durations = self.durations.get(which, array("d"))
         if extra:  # if non-empty list
             # Either an in/valid list
             if None in extra:  # invalid
@@ -606,14 +778,14 @@ class Logger:
         stored for each of the logged events of
         :class:`~wikitransp.scraper.logger.Log` type ``which``. This means
         how long each of the logged steps took since the previous event they were
-        timed against. May contain ``None`` if no duration was calculated,
-        else will store a list of floats (the calculated duration in seconds).
+        timed against, as a list of floats (the calculated durations in seconds) for
+        only those events which were timed.
 
         Args:
           which : The Log enum record type (i.e. the type of the event).
         """
-        log_list = self.get_logs(which=which)
-        return [e.duration for e in log_list if e.duration is not None]
+        self.get_logs(which=which)  # Logs an error if there are no events of the type
+        return self.durations.get(which, array("d")).tolist()
 
     def get_last_duration(self, which: Log) -> float | None:
         """
@@ -632,22 +804,18 @@ class Logger:
     def get_logs(self, which: Log) -> list[Event]:
         """
         Return the :class:`~wikitransp.scraper.logger.Event` log entries for the
-        :class:`~wikitransp.scraper.logger.Log` type ``which``.
+        :class:`~wikitransp.scraper.logger.Log` type ``which`` (logging an error and
+        returning an empty list if there are none).
 
         Args:
           which : The Log enum record type (i.e. the type of the event).
         """
-        if not self.has_event(which=which):
-            err_msg = f"Mis-specified timer: {which.name=} not in {[*self.logs]=}"
-            self.error(msg=err_msg)
-        log_list = self.logs.get(which.name)
-        try:
-            assert log_list is not None
-        except:
-            raise AssertionError(f"{which.name=} not in {log_list}")
-        if len(log_list) == 0:
-            err_msg = f"Mis-specified timer: {which.name=} not in {[*self.logs]=}"
+        log_list = self.logs.get(which)
+        if not log_list:
+            logged_names = [k.name for k in self.logs]
+            err_msg = f"Mis-specified timer: {which.name=} not in {logged_names=}"
             self.error(msg=err_msg)
+            return []
         return log_list
 
 
@@ -659,7 +827,7 @@ class Event:
     def __init__(
         self,
         which: Log,
-        when: float,
+        when: int,
         msg: str = "",
         prev: Event | None = None,
         simple_repr: bool = True,
@@ -671,7 +839,8 @@ class Event:
 
         Args:
           which : The type of the event
-          when  : When the event was logged
+          when  : When the event was logged (from :func:`time.monotonic_ns`, so only
+                  comparable to the times of other events)
           msg   : Any message passed with the event (or constructed in the logger)
           prev  : (Optionally) A previous event
         """
@@ -681,10 +850,11 @@ class Event:
         self.prev = prev
         self.simple = simple_repr
         self.duration = self.elapsed
+        self._cached_repr: str | None = None  # The event is never changed once made
 
     @property
     def elapsed(self) -> float | None:
-        return None if self.prev is None else (self.when - self.prev.when)
+        return None if self.prev is None else _ns_to_s(self.when - self.prev.when)
 
     def __elapsed_repr__(self, unit: str = "s", show_since_which: bool = False) -> str:
         """
@@ -693,19 +863,23 @@ class Event:
         """
         assert self.prev is not None  # Checked before calling, give mypy a clue
         if show_since_which:
-            r = f"{self.elapsed:.4f}{unit} since {self.prev.type.name}"
+            r = f"{self.duration:.4f}{unit} since {self.prev.type.name}"
         else:
-            r = f"in {self.elapsed:.4f}{unit}"
+            r = f"in {self.duration:.4f}{unit}"
         return r
 
     def __repr__(self):
         """
-        Show the event message (if any) after its type and time.
+        Show the event message (if any) after its type and time. This is formatted
+        once and cached, as an event may be written and then shown again.
         """
-        msg = f" ⠶ {self.msg}" if self.msg else ""
-        elapsed = ""
+        if self._cached_repr is None:
+            self._cached_repr = self._format_repr()
+        return self._cached_repr
+
+    def _format_repr(self) -> str:
+        msg_part = f" ⠶ {self.msg}" if self.msg else ""
+        elapsed_part = ""
         if self.prev:
-            show_which = not self.simple
-            elapsed_repr = self.__elapsed_repr__(show_since_which=show_which)
-            elapsed += f" {elapsed_repr}"
-        return f"{self.type.name}{msg}{elapsed}"
+            elapsed_part = " " + self.__elapsed_repr__(show_since_which=not self.simple)
+        return f"{self.type.name}{msg_part}{elapsed_part}"
@@ -0,0 +1,223 @@
+from __future__ import annotations
+
+import struct
+import zlib
+from typing import Iterable
+
+from range_streams.codecs import PngStream
+from range_streams.codecs.png.data import PngChunkInfo
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None  # type: ignore[assignment]  # Fall back to unfiltering PNGs in Python
+
+__all__ = [
+    "confirm_idat_alpha",
+    "any_semitransparent_scanline",
+    "enumerate_idat_chunks",
+]
+
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+_ADAM7_INTERLACING = 1  # The IHDR interlace method of an Adam7 interlaced PNG
+# The starting column and row, and column and row step, of each Adam7 pass
+_ADAM7_PASSES = [
+    (0, 0, 8, 8),
+    (4, 0, 8, 8),
+    (0, 4, 4, 8),
+    (2, 0, 4, 4),
+    (0, 2, 2, 4),
+    (1, 0, 2, 2),
+    (0, 1, 1, 2),
+]
+
+
+def confirm_idat_alpha(stream: PngStream, nonzero: bool = True) -> bool:
+    """
+    Download the image data for a PNG image -- i.e. its IDAT chunk(s) -- and determine
+    whether or not there is any non-maximum alpha value therein. This is to distinguish
+    an image with an alpha channel (RGBA), but with all ``255`` values in that channel,
+    from an image with an alpha channel and actual transparent or semitransparent
+    pixels. It is recommended to pass in a thumbnail if possible to speed up this step.
+
+    If the image uses an indexed palette and tRNS chunk rather than IDAT chunk RGBA
+    values, this can't be checked, so assume it has transparency.
+
+    Presumes :meth:`~range_streams.codecs.png.PngStream.alpha_as_direct` has already
+    been called, to check the PNG has the possibility of an alpha channel before
+    this function 'confirms' the channel is effectively used (rather than being entirely
+    ``255``, fully opaque and non-transparent) by checking the IDAT chunks themselves.
+
+    For simplicity, do not bother handling indexed PNGs (whose channel count will be 1),
+    only those with 4 channels in the IDAT data will be used (so indexed PNGs with
+    transparency will not be accepted, and return ``False`` from this method).
+
+    Args:
+      stream  : The :class:`~range_streams.codecs.png.PngStream` whose IDAT chunk(s)
+                will be checked for the image data's alpha channel, or lack thereof.
+      nonzero : If ``True`` (the default), checks specifically for semitransparency.
+                If ``False``, checks for any transparency (i.e. any non-opacity).
+    """
+    ihdr = stream.data.IHDR
+    if ihdr.channel_count != 4 or ihdr.bit_depth != 8:
+        return False
+    assert ihdr.height is not None and ihdr.width is not None  # give mypy a clue
+    # Read each IDAT chunk only once the scanlines before it have been checked
+    idat_data = map(stream.get_chunk_data, enumerate_idat_chunks(stream))
+    return any_semitransparent_scanline(
+        idat_data,
+        ihdr.width,
+        ihdr.height,
+        nonzero,
+        interlaced=ihdr.interlacing == _ADAM7_INTERLACING,
+    )
+
+
+def any_semitransparent_scanline(
+    idat_data: Iterable[bytes],
+    width: int,
+    height: int,
+    nonzero: bool = True,
+    interlaced: bool = False,
+) -> bool:
+    """
+    Decompress and unfilter the scanlines of an 8-bit RGBA PNG one at a time, checking
+    the alpha values of each as it goes, so as to stop at the first with any
+    (semi)transparent pixel (without decompressing the rest of the image data, or
+    reading the rest of the IDAT chunks from ``idat_data`` if it is lazy). The
+    scanlines are unfiltered with :mod:`numpy` where possible (i.e. for all but the
+    Average and Paeth filters, which depend on the pixel to the left) if installed.
+
+    The image data of an interlaced PNG is a series of reduced images (one per Adam7
+    pass), each filtered as a whole image would be, so they are checked in turn (as
+    only whether any pixel is transparent matters, not where it goes in the image).
+
+    Raises:
+      ValueError if the image data ends before the last scanline.
+
+    Args:
+      idat_data  : The (compressed) data of each of the IDAT chunks, in order
+      width      : The width of the image (i.e. the number of pixels per scanline)
+      height     : The height of the image (i.e. the number of scanlines)
+      nonzero    : If ``True`` (the default), checks specifically for semitransparency.
+                   If ``False``, checks for any transparency (i.e. any non-opacity).
+      interlaced : Whether the PNG is interlaced (with the Adam7 method)
+    """
+    passes = _adam7_pass_sizes(width, height) if interlaced else [(width, height)]
+    n_total = sum(pass_height for _, pass_height in passes)
+    chunks = iter(idat_data)
+    decompressor = zlib.decompressobj()
+    pending = b""
+    offset = 0  # The start of the next scanline in `pending`
+    n_scanlines = 0
+    for pass_width, pass_height in passes:
+        stride = 1 + pass_width * 4  # Each scanline starts with its filter type byte
+        prior = bytes(stride - 1)  # The scanline 'before' the first is all zero
+        for _ in range(pass_height):
+            while len(pending) - offset < stride:
+                data = next(chunks, None)
+                if data is None:
+                    msg = f"Image data ended after {n_scanlines} of {n_total} scanlines"
+                    raise ValueError(msg)
+                pending = pending[offset:] + decompressor.decompress(data)
+                offset = 0
+            filter_type = pending[offset]
+            filtered = pending[offset + 1 : offset + stride]
+            prior = _unfilter_scanline(filter_type, filtered, prior)
+            if _any_transparent(prior[3::4], nonzero):
+                return True
+            offset += stride
+            n_scanlines += 1
+    return False
+
+
+def _adam7_pass_sizes(width: int, height: int) -> list[tuple[int, int]]:
+    """
+    The width and height of each of the reduced images of an Adam7 interlaced PNG,
+    omitting any pass with no pixels (which has no scanlines in the image data).
+    See: https://www.w3.org/TR/png/#8Interlace
+
+    Args:
+      width  : The width of the image
+      height : The height of the image
+    """
+    sizes = []
+    for x0, y0, dx, dy in _ADAM7_PASSES:
+        pass_width = (width - x0 + dx - 1) // dx
+        pass_height = (height - y0 + dy - 1) // dy
+        if pass_width > 0 and pass_height > 0:
+            sizes.append((pass_width, pass_height))
+    return sizes
+
+
+def _unfilter_scanline(filter_type: int, filtered: bytes, prior: bytes) -> bytes:
+    """
+    Reverse the filter applied to a scanline of an 8-bit RGBA PNG (4 bytes per pixel).
+    See: http://www.libpng.org/pub/png/spec/1.2/PNG-Filters.html
+
+    Args:
+      filter_type : The filter type, given by the first byte of the scanline
+      filtered    : The rest of the scanline
+      prior       : The previous (unfiltered) scanline
+    """
+    if filter_type == 0:  # None
+        return filtered
+    if np is not None and filter_type in (1, 2):
+        x = np.frombuffer(filtered, dtype=np.uint8)
+        if filter_type == 1:  # Sub: a cumulative sum over each channel (mod 256)
+            return x.reshape(-1, 4).cumsum(axis=0, dtype=np.uint8).tobytes()
+        return (x + np.frombuffer(prior, dtype=np.uint8)).tobytes()  # Up
+    recon = bytearray(filtered)
+    for i in range(len(recon)):
+        a = recon[i - 4] if i >= 4 else 0
+        b = prior[i]
+        if filter_type == 1:  # Sub
+            recon[i] = (recon[i] + a) & 0xFF
+        elif filter_type == 2:  # Up
+            recon[i] = (recon[i] + b) & 0xFF
+        elif filter_type == 3:  # Average
+            recon[i] = (recon[i] + ((a + b) >> 1)) & 0xFF
+        elif filter_type == 4:  # Paeth
+            c = prior[i - 4] if i >= 4 else 0
+            p = a + b - c
+            pa, pb, pc = abs(p - a), abs(p - b), abs(p - c)
+            predictor = a if pa <= pb and pa <= pc else (b if pb <= pc else c)
+            recon[i] = (recon[i] + predictor) & 0xFF
+        else:
+            raise ValueError(f"Unknown filter type: {filter_type}")
+    return bytes(recon)
+
+
+def _any_transparent(alpha: bytes, nonzero: bool) -> bool:
+    """
+    Whether any of the ``alpha`` values is below 255 (and if ``nonzero``, above 0).
+
+    Args:
+      alpha   : The alpha values of the pixels in a scanline
+      nonzero : Whether to only count semitransparent (rather than fully transparent)
+    """
+    if nonzero:
+        return len(alpha.translate(None, b"\x00\xff")) > 0  # Delete 0s and 255s
+    return alpha.count(b"\xff") < len(alpha)
+
+
+def enumerate_idat_chunks(stream: PngStream) -> list[PngChunkInfo]:
+    """
+    Enumerate the IDAT chunks of a PNG, as for
+    :meth:`~range_streams.codecs.png.PngStream.enumerate_chunks`, but stopping after
+    the last of them (they must be consecutive) rather than reading on to the IEND
+    chunk, which would go through any chunks after the image data for nothing.
+
+    Args:
+      stream : The :class:`~range_streams.codecs.png.PngStream` of the PNG
+    """
+    idat_chunks: list[PngChunkInfo] = []
+    chunk_start = len(_PNG_SIGNATURE)
+    while True:
+        stream.add((chunk_start, chunk_start + 8))  # Chunk length and type
+        chunk_length, chunk_type = struct.unpack(">I4s", stream.read())
+        if chunk_type == b"IDAT":
+            idat_chunks.append(PngChunkInfo("IDAT", chunk_start, chunk_length))
+        elif idat_chunks or chunk_type == b"IEND":
+            return idat_chunks
+        chunk_start += chunk_length + 12  # Length, type, data, and CRC
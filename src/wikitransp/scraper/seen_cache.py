@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import sqlite3
+from pathlib import Path
+
+__all__ = ["SeenCache"]
+
+_COMMIT_INTERVAL = 1000  # Number of records between commits
+
+
+class SeenCache:
+    """
+    A SQLite database of the outcomes of checking (thumbnail) PNG URLs, persisted
+    across runs so that URLs already known not to be worth fetching (those which gave
+    a 404 or are known to have no alpha channel or no semitransparent pixels) can be
+    skipped without a request.
+    """
+
+    def __init__(self, path: Path):
+        """
+        Args:
+          path : The path to the SQLite database file (created if it doesn't exist)
+        """
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")  # Don't block readers on commits
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS seen"
+            "(url TEXT PRIMARY KEY, status INTEGER, channels INTEGER, alpha INTEGER)"
+        )
+        self.n_uncommitted = 0
+
+    def is_rejected(self, url: str) -> bool:
+        """
+        Whether the URL was rejected when checked on a previous run: it gave a 404,
+        or its PNG has no alpha channel or no semitransparent pixels.
+
+        Args:
+          url : The URL to look up
+        """
+        row = self.conn.execute(
+            "SELECT status, channels, alpha FROM seen WHERE url=?", (url,)
+        ).fetchone()
+        if row is None:
+            return False
+        status, channels, alpha = row
+        return status == 404 or channels not in (None, 4) or alpha == 0
+
+    def skippable_urls(self, include_accepted: bool = False) -> set[str]:
+        """
+        Load all the URLs rejected on previous runs (as for :meth:`is_rejected`) in a
+        single query, so that they can be skipped with a set membership test rather
+        than a query per URL.
+
+        Args:
+          include_accepted : Whether to also include the URLs of PNGs found to have
+                             semitransparent pixels (i.e. those already written to
+                             the output, when resuming a run)
+        """
+        query = (
+            "SELECT url FROM seen"
+            " WHERE status=404 OR (channels IS NOT NULL AND channels!=4) OR alpha=0"
+        )
+        if include_accepted:
+            query += " OR alpha=1"
+        return {url for (url,) in self.conn.execute(query)}
+
+    def record(
+        self,
+        url: str,
+        status: int,
+        channels: int | None = None,
+        alpha: bool | None = None,
+    ) -> None:
+        """
+        Record the outcome of checking a URL, committing the transaction every
+        ``_COMMIT_INTERVAL`` records rather than after each (which would dominate).
+
+        Args:
+          url      : The URL checked
+          status   : The HTTP status code of the response
+          channels : The number of channels of the PNG (if known)
+          alpha    : Whether the PNG has semitransparent pixels (if checked)
+        """
+        alpha_int = None if alpha is None else int(alpha)
+        self.conn.execute(
+            "INSERT OR REPLACE INTO seen VALUES (?, ?, ?, ?)",
+            (url, status, channels, alpha_int),
+        )
+        self.n_uncommitted += 1
+        if self.n_uncommitted >= _COMMIT_INTERVAL:
+            self.commit()
+
+    def commit(self) -> None:
+        self.conn.commit()
+        self.n_uncommitted = 0
+
+    def close(self) -> None:
+        self.commit()
+        self.conn.close()
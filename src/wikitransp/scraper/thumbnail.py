@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import json
+import re
+from functools import lru_cache
+from typing import TYPE_CHECKING
+
+MYPY = False  # when using mypy will be overrided as True
+if MYPY or not TYPE_CHECKING:  # pragma: no cover
+    import httpx  # avoid importing to Sphinx type checker
+
+from .clients import make_client
+
+__all__ = ["get_png_thumbnail_url", "get_api_client"]
+
+_DEFAULT_THUMB_WIDTH = 100
+_THUMB_CACHE_SIZE = 1 << 20  # PNG URLs recur across the shards of the dataset
+_WPC_HOST_PATH = "upload.wikimedia.org/wikipedia/commons/"
+_WPC_PREFIX = f"https://{_WPC_HOST_PATH}"
+# Matches the (JSON string) thumbnail URL in a Wikipedia API imageinfo response
+_THUMBURL_JSON_REGEX = re.compile(rb'"thumburl":\s*("(?:[^"\\]|\\.)*")')
+
+_api_client: httpx.Client | None = None  # Reused for all Wikipedia API calls
+
+
+@lru_cache(maxsize=_THUMB_CACHE_SIZE)
+def get_png_thumbnail_url(
+    png_url: str, width: int = _DEFAULT_THUMB_WIDTH, guess: bool = True
+) -> str:
+    f"""
+    Given the full URL of a PNG of an image on Wikipedia Commons ``png_url``, extract
+    its filename and use that to create a thumbnail URL with the given ``width``.
+
+    Note: if the width of the PNG at the input URL is less than or equal to the
+    requested thumbnail ``width``, the API will simply return the input URL
+    (but without loading the input URL, it's not possible to know this in advance).
+
+    Args:
+      png_url : URL of a PNG under ``https://upload.wikimedia.org/wikipedia/commons/``
+      width   : The desired output thumbnail's width (default:
+                ``{_DEFAULT_THUMB_WIDTH=}``px)
+      guess   : Whether to simply guess using the standard format (avoiding the
+                need to wait for the API call).
+
+    Results are cached, so a PNG seen in more than one shard (by the same process)
+    is only looked up once (and a failed guess only calls the API once).
+    """
+    scheme, _, host_path = png_url.partition("://")
+    if guess and scheme in ("https", "http") and host_path.startswith(_WPC_HOST_PATH):
+        path = host_path[len(_WPC_HOST_PATH) :]
+        subdirs_end = path.rfind("/") + 1
+        subdirs, filename = path[:subdirs_end], path[subdirs_end:]
+        return f"{_WPC_PREFIX}thumb/{subdirs}{filename}/{width}px-{filename}"
+    # The input URL doesn't match expected format (or not guessing): call the API
+    return _thumb_via_api(png_url, width)
+
+
+def _thumb_via_api(png_url: str, width: int) -> str:
+    """
+    Look up the thumbnail URL for a PNG on Wikipedia Commons with the Wikipedia API.
+
+    Args:
+      png_url : URL of a PNG on Wikipedia Commons
+      width   : The desired output thumbnail's width
+    """
+    filename = png_url[png_url.rfind("/") + 1 :]
+    api_url = (
+        "https://en.wikipedia.org/w/api.php?"
+        "action=query&format=json"
+        "&prop=imageinfo"
+        f"&titles=File:{filename}"
+        f"&iiurlwidth={width}"
+        "&iiprop=url"
+    )
+    r = get_api_client().get(api_url)
+    # Only the thumbnail URL is wanted, so find it rather than parse the whole response
+    match = _THUMBURL_JSON_REGEX.search(r.content)
+    if match is None:
+        # Want to know which URLs don't conform if any
+        raise ValueError(f"{api_url=} does not conform")
+    return json.loads(match.group(1))  # Unescape the JSON string
+
+
+def get_api_client() -> httpx.Client:
+    """
+    Lazily construct the module-level :class:`httpx.Client` for the Wikipedia API, so
+    that API calls reuse its connection rather than each making a new TCP+TLS one.
+    """
+    global _api_client
+    if _api_client is None:
+        _api_client = make_client(fetch_async=False)
+    return _api_client
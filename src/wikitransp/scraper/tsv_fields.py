@@ -0,0 +1,21 @@
+__all__ = ["TSV_FIELDS"]
+
+
+class TSV_FIELDS:
+    LANG = 0
+    PAGE_URL = 1
+    IMAGE_URL = 2
+    PAGE_TITLE = 3
+    SECTION_TITLE = 4
+    HIERARCHICAL_SECTION_TITLE = 5
+    CAPTION_REFERENCE_DESCRIPTION = 6
+    CAPTION_ATTRIBUTION_DESCRIPTION = 7
+    CAPTION_ALT_TEXT_DESCRIPTION = 8
+    MIME_TYPE = 9
+    ORIGINAL_HEIGHT = 10
+    ORIGINAL_WIDTH = 11
+    IS_MAIN_IMAGE = 12
+    ATTRIBUTION_PASSES_LANG_ID = 13
+    PAGE_CHANGED_RECENTLY = 14
+    CONTEXT_PAGE_DESCRIPTION = 15
+    CONTEXT_SECTION_DESCRIPTION = 16
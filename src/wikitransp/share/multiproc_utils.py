@@ -1,21 +1,20 @@
 from __future__ import annotations
 
 import multiprocessing as mp
-from multiprocessing import Process, Pool
-from more_itertools import chunked
-from tqdm import tqdm
-from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import Pool
 
+from tqdm import tqdm
 
 __all__ = ["batch_multiprocess", "batch_multiprocess_with_return"]
 
-def run_and_update(func, pbar):
-    func()
-    pbar.update()
 
-def append_and_update(result, results_list, pbar):
-    results_list.append(result)
-    pbar.update()
+def _invoke(func):
+    """
+    Call a function (at module level, so that it can be pickled to a pool worker).
+    """
+    return func()
+
 
 def batch_multiprocess(
     function_list, n_cores=mp.cpu_count(), show_progress=False, tqdm_desc=None
@@ -23,23 +22,15 @@ def batch_multiprocess(
     """
     Run a list of functions on ``n_cores`` (default: all CPU cores),
     with the option to show a progress bar using tqdm (default: shown).
+    Each worker process takes the next function as soon as it finishes one, rather
+    than waiting for the rest of a batch.
     """
-    # MAY HAVE BROKEN THIS
-    print("MAY HAVE BROKEN THIS")
-    iterator = [*chunked(function_list, n_cores)]
     if show_progress:
         pbar = tqdm(desc=tqdm_desc, total=len(function_list))
-    for func_batch in iterator:
-        procs = []
-        for f in func_batch:
+    with Pool(processes=n_cores) as pool:
+        for _ in pool.imap_unordered(_invoke, function_list):
             if show_progress:
-                f_tqdm = partial(run_and_update, func=f, pbar=pbar)
-            target = f_tqdm if show_progress else f
-            procs.append(Process(target=target))
-        for p in procs:
-            p.start()
-        for p in procs:
-            p.join()
+                pbar.update()
 
 
 def batch_multiprocess_with_return(
@@ -52,19 +43,17 @@ def batch_multiprocess_with_return(
     """
     Run a list of functions on ``n_cores`` (default: all CPU cores),
     with the option to show a progress bar using tqdm (default: shown).
+    The results are returned in the order of ``function_list`` (appended to
+    ``pool_results`` if given).
     """
-    iterator = [*chunked(function_list, n_cores)]
-    pool_results = pool_results if pool_results else []
-    pool = Pool(processes=n_cores)
+    pool_results = [] if pool_results is None else pool_results
+    # Send the workers a few chunks each, rather than one task (and result) at a time
+    chunksize = max(1, len(function_list) // (n_cores * 4))
     if show_progress:
         pbar = tqdm(total=len(function_list), desc=tqdm_desc)
-    for func_batch in iterator:
-        procs = []
-        for f in func_batch:
+    with ProcessPoolExecutor(max_workers=n_cores) as executor:
+        for result in executor.map(_invoke, function_list, chunksize=chunksize):
+            pool_results.append(result)
             if show_progress:
-                tqdm_cb = partial(append_and_update, results_list=pool_results, pbar=pbar)
-            callback = tqdm_cb if show_progress else pool_results.append
-            pool.apply_async(func=f, callback=tqdm_cb)
-    pool.close()
-    pool.join()
+                pbar.update()
     return pool_results
@@ -0,0 +1,112 @@
+import asyncio
+
+import httpx
+from pytest import fixture, mark, raises
+
+from wikitransp.scraper import async_utils
+from wikitransp.scraper.async_utils import (
+    async_fetch_shards,
+    fetch_images,
+    get_shared_client,
+)
+from wikitransp.scraper.clients import _USER_AGENT
+
+
+@fixture
+def sync_loop():
+    yield
+    async_utils._close_sync_loop()  # Also closes the shared client if used on it
+    asyncio.run(async_utils.close_shared_client())
+
+
+def test_fetch_images_shares_client(tmp_path, sync_loop):
+    fetch_images([], [], save_dir=tmp_path)
+    client = async_utils._shared_client
+    fetch_images([], [], save_dir=tmp_path)
+    assert client is async_utils._shared_client
+    assert not client.is_closed
+
+
+def test_stale_shared_client_closed(tmp_path, sync_loop):
+    fetch_images([], [], save_dir=tmp_path)
+    client = async_utils._shared_client
+
+    async def get_client():
+        return get_shared_client()
+
+    assert client is not asyncio.run(get_client())
+    assert client.is_closed
+
+
+def test_shared_client_user_agent(tmp_path, sync_loop):
+    fetch_images([], [], save_dir=tmp_path)
+    assert _USER_AGENT == async_utils._shared_client.headers["User-Agent"]
+
+
+def test_fetch_images_skips_errors(tmp_path, sync_loop):
+    def handler(request):
+        if request.url.path == "/gone.png":
+            return httpx.Response(404, content=b"Not found")
+        return httpx.Response(200, content=request.url.path.encode())
+
+    names = ("a.png", "gone.png", "en/b.png", "commons/b.png", "dir/")
+    images = [{"url": f"https://example.org/{name}"} for name in names]
+    with_image, gone, en_image, commons_image, no_name = images
+    transport = httpx.MockTransport(handler)
+    session = httpx.AsyncClient(transport=transport)
+    fetch_images(
+        [im["url"] for im in images], images, session=session, save_dir=tmp_path
+    )
+    assert b"/a.png" == with_image["path"].read_bytes()
+    # Images with the same filename at different paths don't overwrite each other
+    assert b"/en/b.png" == en_image["path"].read_bytes()
+    assert b"/commons/b.png" == commons_image["path"].read_bytes()
+    assert "path" not in gone
+    assert "path" not in no_name
+    saved = {im["path"] for im in (with_image, en_image, commons_image)}
+    assert saved == set(tmp_path.iterdir())
+
+
+@mark.parametrize(
+    "size_known,honour_range,body",
+    [
+        (True, True, b"0123456789abcdef"),
+        (True, False, b"0123456789abcdef"),
+        (False, False, b"0123456789abcdef"),
+        (True, True, b""),
+    ],
+)
+def test_async_fetch_shards(tmp_path, size_known, honour_range, body):
+    n_full_bodies_read = 0
+
+    async def full_body():
+        nonlocal n_full_bodies_read
+        n_full_bodies_read += 1
+        yield body
+
+    def handler(request):
+        if request.method == "HEAD":
+            headers = {"Content-Length": str(len(body))} if size_known else {}
+            return httpx.Response(200, headers=headers)
+        range_header = request.headers.get("Range")
+        if range_header is None or not honour_range:
+            return httpx.Response(200, content=full_body())
+        first, last = map(int, range_header.split("=")[1].split("-"))
+        headers = {"Content-Range": f"bytes {first}-{last}/{len(body)}"}
+        return httpx.Response(206, headers=headers, content=body[first : last + 1])
+
+    async def fetch_shard():
+        transport = httpx.MockTransport(handler)
+        async with httpx.AsyncClient(transport=transport) as session:
+            urls = ["https://example.org/shard.tsv.gz"]
+            return await async_fetch_shards(urls, tmp_path, 3, session=session)
+
+    if size_known and not honour_range:
+        with raises(ValueError):
+            asyncio.run(fetch_shard())
+        assert 0 == n_full_bodies_read  # Rejected before reading the entire file
+        assert [] == list(tmp_path.iterdir())
+    else:
+        [path] = asyncio.run(fetch_shard())
+        assert body == path.read_bytes()
+        assert [path] == list(tmp_path.iterdir())
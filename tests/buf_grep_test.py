@@ -0,0 +1,57 @@
+from pytest import fixture, mark
+
+from wikitransp.scraper.buf_grep import (
+    grep_backwards,
+    grep_backwards_mmap,
+    grep_backwards_multi,
+    grep_backwards_pread,
+)
+
+
+@fixture
+def example_file(tmp_path):
+    path = tmp_path / "example.txt"
+    path.write_text("".join(f"Hi {i}\n" for i in range(0, 100, 9)))
+    return path
+
+
+@mark.parametrize("step", [3, 8 * 1024 * 1024])
+def test_grep_backwards_tac(example_file, step):
+    with open(example_file) as fh:
+        expected = list(reversed(fh.readlines()))
+        assert expected == list(grep_backwards(fh, match_substr="", step=step))
+
+
+@mark.parametrize("expected", [["Hi 99\n", "Hi 90\n", "Hi 9\n"]])
+def test_grep_backwards_match(example_file, expected):
+    with open(example_file) as fh:
+        assert expected == list(grep_backwards(fh, match_substr="Hi 9"))
+
+
+@mark.parametrize("expected", [["Hi 99\n", "Hi 90\n", "Hi 27\n", "Hi 9\n"]])
+def test_grep_backwards_multi(example_file, expected):
+    with open(example_file) as fh:
+        assert expected == list(grep_backwards_multi(fh, patterns=["Hi 9", "27"]))
+
+
+@mark.parametrize("content", ["Hi 0\nHi 9", "\n\nHi 0\n\nHi 9\n", "Hi 0\n", ""])
+@mark.parametrize("match_substr", [b"", b"Hi 9"])
+@mark.parametrize("grep_func", [grep_backwards_mmap, grep_backwards_pread])
+def test_grep_backwards_bytes(tmp_path, content, match_substr, grep_func):
+    path = tmp_path / "example.txt"
+    path.write_text(content)
+    with open(path) as fh:
+        lines = reversed(fh.readlines())
+        expected = [line for line in lines if match_substr.decode() in line]
+    assert expected == list(grep_func(path, match_substr=match_substr))
+
+
+@mark.parametrize("content", ["Hi 0\nHi 9", "\nHi 9\n", ""])
+@mark.parametrize("match_substr", ["", "Hi", "\n"])
+def test_grep_backwards_edge_cases(tmp_path, content, match_substr):
+    path = tmp_path / "example.txt"
+    path.write_text(content)
+    with open(path) as fh:
+        lines = reversed(fh.readlines())
+        expected = [line for line in lines if match_substr in line]
+        assert expected == list(grep_backwards(fh, match_substr=match_substr))
@@ -0,0 +1,177 @@
+import asyncio
+import struct
+import zlib
+
+import httpx
+from pytest import mark
+from range_streams.codecs import PngStream
+
+from wikitransp.scraper import check_png
+from wikitransp.scraper.check_png import (
+    check_tsv_unquoted,
+    fetch_ihdrs,
+    handle_tsv_file,
+    quick_ihdr,
+)
+from wikitransp.scraper.logger import Logger
+from wikitransp.scraper.png_alpha import confirm_idat_alpha, enumerate_idat_chunks
+
+
+def make_chunk(chunk_type, data):
+    crc = struct.pack(">I", zlib.crc32(chunk_type + data))
+    return struct.pack(">I", len(data)) + chunk_type + data + crc
+
+
+def make_png_head(width, height, bit_depth, colour_type, interlace=0):
+    ihdr = struct.pack(
+        ">IIBBBBB", width, height, bit_depth, colour_type, 0, 0, interlace
+    )
+    return b"\x89PNG\r\n\x1a\n" + make_chunk(b"IHDR", ihdr)
+
+
+def make_rgba_png(width, height, alpha, n_idat=2):
+    """An RGBA PNG of one alpha value, with its image data split into ``n_idat``"""
+    scanline = b"\x00" + bytes([10, 20, 30, alpha]) * width
+    idat = zlib.compress(scanline * height)
+    step = -(-len(idat) // n_idat)
+    idat_chunks = [
+        make_chunk(b"IDAT", idat[i : i + step]) for i in range(0, len(idat), step)
+    ]
+    tail = make_chunk(b"tEXt", b"Comment\x00after the image data") + make_chunk(
+        b"IEND", b""
+    )
+    return make_png_head(width, height, 8, 6) + b"".join(idat_chunks) + tail
+
+
+class RangeTransport(httpx.BaseTransport):
+    """Serve a single file, supporting open-ended range requests"""
+
+    def __init__(self, body):
+        self.body = body
+
+    def handle_request(self, request):
+        start = int(request.headers["Range"].split("=")[1].split("-")[0])
+        size = len(self.body)
+        headers = {
+            "Content-Range": f"bytes {start}-{size - 1}/{size}",
+            "Content-Length": str(size - start),
+        }
+        stream = httpx.ByteStream(self.body[start:])
+        return httpx.Response(206, headers=headers, stream=stream)
+
+
+@mark.parametrize("expected", [(640, 480, 8, 6)])
+def test_quick_ihdr(expected):
+    body = make_png_head(*expected) + b"\x00" * 1000
+
+    def handler(request):
+        assert "bytes=0-32" == request.headers["Range"]
+        return httpx.Response(206, content=body[:33])
+
+    async def read_ihdr():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            return await quick_ihdr("https://example.org/x.png", client)
+
+    assert expected == asyncio.run(read_ihdr())
+
+
+@mark.parametrize(
+    "line,expected",
+    [('en\ta b\tsay "hi"\n', True), ('en\t"a\tb"\tc\n', False)],
+)
+def test_check_tsv_unquoted(tmp_path, line, expected):
+    tsv_path = tmp_path / "shard.tsv"
+    tsv_path.write_text("language\tpage_url\timage_url\n" + line)
+    try:
+        check_tsv_unquoted(tsv_path)
+    except ValueError:
+        unquoted = False
+    else:
+        unquoted = True
+    assert expected == unquoted
+
+
+def make_tsv_row(image_url, mime_type, caption="a caption"):
+    fields = ["en", "https://en.wikipedia.org/wiki/X", image_url, "X", "", "", caption]
+    fields += ["", "", mime_type, "50", "60", "true", "true", "false", "", ""]
+    return "\t".join(fields)
+
+
+@mark.parametrize("use_pyarrow", [True, False])
+def test_handle_tsv_file_rows(tmp_path, monkeypatch, use_pyarrow):
+    if not use_pyarrow:
+        monkeypatch.setattr(check_png, "pa", None)
+    logger = Logger(which=[], path=tmp_path / "filter.log", name="test_rows")
+    monkeypatch.setattr(check_png, "log", logger, raising=False)
+    url = "https://upload.wikimedia.org/wikipedia/commons/a/ab/{}.png"
+    expected = [
+        make_tsv_row(url.format("Plain"), "image/png"),
+        # A field with the character pyarrow reads each line up to is kept intact
+        make_tsv_row(url.format("Odd"), "image/png", caption="a\x1fcaption"),
+    ]
+    rows = [
+        make_tsv_row("image_url", "mime_type"),
+        expected[0],
+        make_tsv_row(url.format("Photo").replace(".png", ".jpg"), "image/jpeg"),
+        expected[1],
+        expected[0],  # Duplicate
+    ]
+    tsv_path = tmp_path / "shard.tsv"
+    tsv_path.write_text("\n".join(rows) + "\n")
+    png_urls, thumb_urls, kept_rows = handle_tsv_file(tsv_path, 100, 0, 0)
+    assert expected == kept_rows
+    assert [url.format("Plain"), url.format("Odd")] == png_urls == thumb_urls
+
+
+def test_fetch_ihdrs():
+    heads = {
+        "/a.png": make_png_head(1, 2, 8, 6),
+        "/b.png": make_png_head(3, 4, 8, 2),
+    }
+
+    def handler(request):
+        if request.url.path not in heads:
+            return httpx.Response(404)
+        return httpx.Response(206, content=heads[request.url.path])
+
+    async def read_ihdrs():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            urls = [f"https://{h}.org{p}" for h, p in zip("zya", [*heads, "/c.png"])]
+            return await fetch_ihdrs(urls, client, limit=2)
+
+    a, b, c = asyncio.run(read_ihdrs())
+    assert (1, 2, 8, 6) == a
+    assert (3, 4, 8, 2) == b
+    assert isinstance(c, httpx.HTTPStatusError)
+
+
+@mark.parametrize("alpha,expected", [(128, True), (255, False)])
+def test_confirm_idat_alpha(alpha, expected):
+    client = httpx.Client(transport=RangeTransport(make_rgba_png(5, 3, alpha)))
+    stream = PngStream(url="https://example.org/x.png", client=client)
+    assert 2 == len(enumerate_idat_chunks(stream))
+    assert expected == confirm_idat_alpha(stream)
+
+
+def make_interlaced_rgba_png(width, height, alpha_at):
+    """An opaque Adam7 interlaced RGBA PNG, with alpha 128 at the pixel ``alpha_at``"""
+    passes = [(0, 0, 8, 8), (4, 0, 8, 8), (0, 4, 4, 8), (2, 0, 4, 4), (0, 2, 2, 4)]
+    passes += [(1, 0, 2, 2), (0, 1, 1, 2)]
+    raw = b""
+    for x0, y0, dx, dy in passes:
+        xs, ys = range(x0, width, dx), range(y0, height, dy)
+        if xs and ys:
+            for y in ys:
+                alphas = [128 if (x, y) == alpha_at else 255 for x in xs]
+                raw += b"\x00" + b"".join(bytes([10, 20, 30, a]) for a in alphas)
+    idat = make_chunk(b"IDAT", zlib.compress(raw))
+    head = make_png_head(width, height, 8, 6, interlace=1)
+    return head + idat + make_chunk(b"IEND", b"")
+
+
+@mark.parametrize("alpha_at,expected", [((1, 1), True), ((4, 2), True), (None, False)])
+def test_confirm_idat_alpha_interlaced(alpha_at, expected):
+    png = make_interlaced_rgba_png(5, 3, alpha_at)
+    client = httpx.Client(transport=RangeTransport(png))
+    stream = PngStream(url="https://example.org/x.png", client=client)
+    assert expected == confirm_idat_alpha(stream)
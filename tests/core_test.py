@@ -24,3 +24,9 @@ def test_nothing(foo, expected):
 )
 def test_data_sample_url(expected):
     assert wikitransp.data.SAMPLE_DATA_URL == expected
+
+
+@mark.parametrize("expected", [10])
+def test_data_full_urls(expected):
+    assert expected == len(wikitransp.data.FULL_DATA_URLS)
+    assert isinstance(wikitransp.data.FULL_DATA_URLS, tuple)
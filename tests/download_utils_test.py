@@ -0,0 +1,65 @@
+import asyncio
+
+import httpx
+from pytest import mark
+
+from wikitransp.data import DATA_DIR_URL
+from wikitransp.scraper import download_utils
+from wikitransp.scraper.download_utils import adownload_data_url, download_data_url
+
+DATA = bytes(range(256)) * 10
+
+
+@mark.parametrize("stored", [b"", DATA[:1000], DATA, DATA + b"junk"])
+@mark.parametrize("honour_range", [True, False])
+def test_adownload_data_url(tmp_path, monkeypatch, stored, honour_range):
+    monkeypatch.setattr(download_utils, "store_path", tmp_path)
+    if stored:
+        (tmp_path / "x.tsv.gz").write_bytes(stored)
+
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        if request.method == "HEAD":
+            return httpx.Response(200, headers={"Content-Length": str(len(DATA))})
+        range_header = request.headers.get("Range")
+        if range_header is None or not honour_range:
+            return httpx.Response(200, content=DATA)
+        first, last = range_header[len("bytes=") :].split("-")
+        start, stop = int(first), int(last or len(DATA) - 1) + 1
+        if start >= len(DATA):
+            headers = {"Content-Range": f"bytes */{len(DATA)}"}
+            return httpx.Response(416, headers=headers)
+        headers = {"Content-Range": f"bytes {start}-{stop - 1}/{len(DATA)}"}
+        return httpx.Response(206, headers=headers, content=DATA[start:stop])
+
+    async def download():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            return await adownload_data_url(f"{DATA_DIR_URL}x.tsv.gz", client)
+
+    path = asyncio.run(download())
+    assert tmp_path / "x.tsv.gz" == path
+    assert DATA == path.read_bytes()
+    assert [tmp_path / "x.tsv.gz"] == list(tmp_path.iterdir())  # No parts left over
+    if honour_range and (not stored or len(stored) > len(DATA)):
+        # A new file (or one started over) is fetched as a HEAD then 8 range requests
+        n_requests = 9 if not stored else 10
+        assert n_requests == len(requests)
+    elif stored:
+        assert 1 == len(requests)  # Resumed (or already complete) in one request
+
+
+@mark.parametrize("in_running_loop", [False, True])
+def test_download_data_url(tmp_path, monkeypatch, in_running_loop):
+    async def adownload_data_urls(data_urls):
+        return [tmp_path / url.rpartition("/")[2] for url in data_urls]
+
+    monkeypatch.setattr(download_utils, "adownload_data_urls", adownload_data_urls)
+    data_url = f"{DATA_DIR_URL}x.tsv.gz"
+
+    async def download():
+        return download_data_url(data_url)  # Not awaited, as called from sync code
+
+    path = asyncio.run(download()) if in_running_loop else download_data_url(data_url)
+    assert tmp_path / "x.tsv.gz" == path
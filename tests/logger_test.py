@@ -0,0 +1,70 @@
+import logging
+import time
+from array import array
+
+from pytest import mark
+
+from wikitransp.scraper import logger
+from wikitransp.scraper.logger import (
+    Logger,
+    _BatchedFileHandler,
+    _duration_stats,
+    _fmt_timespan,
+)
+
+RESUME_LINE = (
+    "ResumePoint ⠶ You may want to resume AT the last URL: https://x.org/b.png"
+)
+
+
+@mark.parametrize(
+    "log_text,expected",
+    [
+        ("", None),
+        ("Init\n", None),
+        (f"Init\n{RESUME_LINE}\nBonVoyage\n", RESUME_LINE),
+        (f"{RESUME_LINE.replace('b.png', 'a.png')}\n{RESUME_LINE}", RESUME_LINE),
+    ],
+)
+def test_detect_resume_point(tmp_path, log_text, expected):
+    log_path = tmp_path / "old.log"
+    log_path.write_text(log_text, encoding="utf-8")
+    log = Logger(path=tmp_path / "new.log")
+    log.stop_logging()
+    assert expected == log.detect_resume_point(log_path)
+
+
+def test_get_resume_point(tmp_path):
+    log_path = tmp_path / "run.log"
+    log_path.write_text(f"Init\n{RESUME_LINE}\n", encoding="utf-8")
+    log = Logger(path=log_path, auto_resume=True)
+    log.stop_logging()
+    assert RESUME_LINE == log.get_resume_point()
+
+
+@mark.parametrize(
+    "seconds,expected",
+    [(5.123, "5.12s"), (61.5, "1m 1s"), (3725.3, "1h 2m 5s")],
+)
+def test_fmt_timespan(seconds, expected):
+    assert expected == _fmt_timespan(seconds)
+
+
+@mark.parametrize("use_numpy", [True, False])
+def test_duration_stats(monkeypatch, use_numpy):
+    if not use_numpy:
+        monkeypatch.setattr(logger, "np", None)
+    assert (2.0, 0.5, 4.0) == _duration_stats(array("d", [1.5, 0.5, 4.0, 2.0]))
+
+
+def test_batched_file_handler_idle_flush(tmp_path, monkeypatch):
+    monkeypatch.setattr(logger, "_LOG_FLUSH_INTERVAL_S", 0.1)
+    log_path = tmp_path / "batched.log"
+    handler = _BatchedFileHandler(log_path)
+    # Flushed at once, as nothing has been flushed yet
+    handler.handle(logging.makeLogRecord({"msg": "first"}))
+    handler.handle(logging.makeLogRecord({"msg": "second"}))
+    assert "first\n" == log_path.read_text()  # The second waits in the buffer
+    time.sleep(0.3)  # With no later record to flush it, the timer does
+    assert "first\nsecond\n" == log_path.read_text()
+    handler.close()
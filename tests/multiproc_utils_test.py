@@ -0,0 +1,25 @@
+from functools import partial
+
+from pytest import mark
+
+from wikitransp.share.multiproc_utils import (
+    batch_multiprocess,
+    batch_multiprocess_with_return,
+)
+
+
+@mark.parametrize("show_progress", [False, True])
+def test_batch_multiprocess(tmp_path, show_progress):
+    paths = [tmp_path / f"{i}.txt" for i in range(8)]
+    function_list = [partial(p.write_text, p.name) for p in paths]
+    batch_multiprocess(function_list, n_cores=2, show_progress=show_progress)
+    assert [p.name for p in paths] == [p.read_text() for p in paths]
+
+
+@mark.parametrize("show_progress", [False, True])
+def test_batch_multiprocess_with_return(show_progress):
+    function_list = [partial(pow, i, 2) for i in range(20)]
+    results = batch_multiprocess_with_return(
+        function_list, n_cores=2, show_progress=show_progress
+    )
+    assert [i**2 for i in range(20)] == results
@@ -0,0 +1,37 @@
+from pytest import mark
+
+from wikitransp.scraper.seen_cache import SeenCache
+
+
+@mark.parametrize(
+    "outcome,expected",
+    [
+        ({"status": 404}, True),
+        ({"status": 200, "channels": 3}, True),
+        ({"status": 200, "channels": 4, "alpha": False}, True),
+        ({"status": 200, "channels": 4, "alpha": True}, False),
+        ({"status": 200, "alpha": True}, False),
+        ({"status": 500}, False),
+    ],
+)
+def test_seen_cache(tmp_path, outcome, expected):
+    url = "https://example.org/x.png"
+    cache = SeenCache(tmp_path / "seen.sqlite")
+    assert not cache.is_rejected(url)
+    cache.record(url, **outcome)
+    cache.close()
+    assert expected == SeenCache(tmp_path / "seen.sqlite").is_rejected(url)
+
+
+@mark.parametrize("include_accepted", [False, True])
+def test_skippable_urls(tmp_path, include_accepted):
+    cache = SeenCache(tmp_path / "seen.sqlite")
+    cache.record("https://example.org/gone.png", status=404)
+    cache.record("https://example.org/rgb.png", status=200, channels=3)
+    cache.record("https://example.org/opaque.png", status=200, channels=4, alpha=False)
+    cache.record("https://example.org/semi.png", status=200, channels=4, alpha=True)
+    cache.record("https://example.org/error.png", status=500)
+    expected = {f"https://example.org/{name}.png" for name in ["gone", "rgb", "opaque"]}
+    if include_accepted:
+        expected.add("https://example.org/semi.png")
+    assert expected == cache.skippable_urls(include_accepted=include_accepted)
@@ -0,0 +1,30 @@
+import gzip
+
+from pytest import mark, raises
+
+from wikitransp.data import open_wit_shard, open_wit_tsv
+
+
+@mark.parametrize("expected", ["language\tpage_url\nen\thttps://en.wikipedia.org\n"])
+def test_open_wit_shard(tmp_path, expected):
+    shard = tmp_path / "shard.tsv.gz"
+    shard.write_bytes(gzip.compress(expected.encode()))
+    with open_wit_shard(shard) as f:
+        assert expected == f.read()
+
+
+@mark.parametrize("expected", [b"language\tpage_url\nen\thttps://en.wikipedia.org\n"])
+def test_open_wit_tsv(tmp_path, expected):
+    shard = tmp_path / "shard.tsv.gz"
+    shard.write_bytes(gzip.compress(expected))
+    for _ in range(2):  # The second call reuses the decompressed file
+        with open_wit_tsv(shard) as mm:
+            assert expected == mm[:]
+
+
+@mark.parametrize("filename", ["empty.tsv", "empty.tsv.gz"])
+def test_open_wit_tsv_empty(tmp_path, filename):
+    shard = tmp_path / filename
+    shard.write_bytes(gzip.compress(b"") if filename.endswith(".gz") else b"")
+    with raises(ValueError, match="is empty"):
+        open_wit_tsv(shard)